@@ -1,29 +1,36 @@
+import argparse
+import os
+import sys
+
 import pandas as pd
 import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
 
-# Ruta completa al archivo Excel
-ruta_archivo = r"C:\INGENIERIA\9NO cuatrimestre\Extración de Conocimiento en Base de Datos\Unidad 4\AppKmeans\fastapi-backend\cleaned_data\numerico_test (1).xlsx"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fastapi-backend"))
+from utils.seleccion_k_utils import evaluar_k  # noqa: E402
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Método del codo para elegir k")
+    parser.add_argument("ruta_archivo", help="Archivo numerico_*.xlsx generado por el backend")
+    parser.add_argument("--k-max", type=int, default=10)
+    args = parser.parse_args()
 
-# Cargar archivo
-df = pd.read_excel(ruta_archivo)
+    # Cargar archivo
+    df = pd.read_excel(args.ruta_archivo)
 
-# Filtrar solo columnas que empiecen con "p" y sean numéricas
-columnas_p = [col for col in df.columns if col.lower().startswith("p") and df[col].dtype in ['int64', 'float64']]
-X = df[columnas_p]
+    # Filtrar solo columnas que empiecen con "p" y sean numéricas
+    columnas_p = [col for col in df.columns if col.lower().startswith("p") and df[col].dtype in ['int64', 'float64']]
+    X = df[columnas_p].dropna()
 
-# Graficar diagrama del codo
-inercia = []
-k_range = range(1, 11)
-for k in k_range:
-    kmeans = KMeans(n_clusters=k, random_state=0, n_init='auto')
-    kmeans.fit(X)
-    inercia.append(kmeans.inertia_)
+    # Evaluar cada k en paralelo (inercia, silueta y Davies–Bouldin)
+    evaluacion = evaluar_k(X, 1, args.k_max)
+    k_range = [r["k"] for r in evaluacion["resultados"]]
+    inercia = [r["inertia"] for r in evaluacion["resultados"]]
+    print(f"k sugerido (silueta): {evaluacion['k_sugerido']}")
 
-plt.figure(figsize=(8, 5))
-plt.plot(k_range, inercia, marker='o')
-plt.xlabel('Número de clusters (k)')
-plt.ylabel('Inercia')
-plt.title('Método del Codo para elegir k')
-plt.grid(True)
-plt.show()
+    plt.figure(figsize=(8, 5))
+    plt.plot(k_range, inercia, marker='o')
+    plt.xlabel('Número de clusters (k)')
+    plt.ylabel('Inercia')
+    plt.title('Método del Codo para elegir k')
+    plt.grid(True)
+    plt.show()
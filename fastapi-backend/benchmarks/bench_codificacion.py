@@ -0,0 +1,85 @@
+"""Compara la codificación por celda (applymap + map con lambda) contra CodificadorEncuesta.codificar_matriz.
+
+Uso (desde fastapi-backend/):
+    python -m benchmarks.bench_codificacion --filas 200000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from mapeos.cuestionario import CUESTIONARIO
+from mapeos.mapeos import mapeos
+from utils.codificacion_utils import CodificadorEncuesta, limpiar_texto, limpiar_valores
+
+
+def generar_respuestas(filas: int, semilla: int = 42) -> pd.DataFrame:
+    """Genera un set sintético con el texto original de las preguntas y opciones."""
+    rng = np.random.default_rng(semilla)
+    datos = {"Marca temporal": pd.date_range("2025-07-10", periods=filas, freq="s")}
+    for pregunta, opciones in mapeos.items():
+        textos = np.array([f"  {op.upper()} " if i % 2 else op for i, op in enumerate(opciones)], dtype=object)
+        datos[pregunta] = textos[rng.integers(0, len(textos), size=filas)]
+    return pd.DataFrame(datos)
+
+
+def codificar_por_celda(df: pd.DataFrame) -> pd.DataFrame:
+    """Camino original de /generar-set-numerico, conservado solo como referencia."""
+    df = df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
+    df = df.applymap(lambda x: x.lower() if isinstance(x, str) else x)
+    mapeos_numerados = {
+        f"p{i+1}": {"pregunta": pregunta, "opciones": opciones}
+        for i, (pregunta, opciones) in enumerate(mapeos.items())
+    }
+    df_numerico = df.copy()
+    df_numerico.columns = [limpiar_texto(col) for col in df_numerico.columns]
+    mapa_columnas = {
+        limpiar_texto(contenido["pregunta"]): clave
+        for clave, contenido in mapeos_numerados.items()
+    }
+    df_numerico.rename(columns=lambda col: mapa_columnas.get(col, col), inplace=True)
+    mapeos_normalizados = {
+        limpiar_texto(clave): {
+            limpiar_texto(resp): val for resp, val in contenido["opciones"].items()
+        }
+        for clave, contenido in mapeos_numerados.items()
+    }
+    for pregunta_norm, opciones in mapeos_normalizados.items():
+        if pregunta_norm in df_numerico.columns:
+            df_numerico[pregunta_norm] = df_numerico[pregunta_norm].map(
+                lambda x: opciones.get(limpiar_texto(x), None)
+            )
+    return df_numerico
+
+
+def como_matriz(df_numerico: pd.DataFrame, columnas: list) -> np.ndarray:
+    """Resultado por celda en el formato de codificar_matriz (int8, 0 si no hubo coincidencia)."""
+    return df_numerico[columnas].apply(pd.to_numeric).fillna(0).to_numpy(dtype=np.int8)
+
+
+def medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=200_000)
+    args = parser.parse_args()
+
+    df = generar_respuestas(args.filas)
+    codificador = CodificadorEncuesta(CUESTIONARIO)
+
+    esperado, t_celda = medir(codificar_por_celda, df)
+    (matriz, columnas), t_vector = medir(lambda d: codificador.codificar_matriz(limpiar_valores(d)), df)
+
+    np.testing.assert_array_equal(como_matriz(esperado, columnas), matriz)
+    print(f"filas: {args.filas} x {len(mapeos)} preguntas")
+    print(f"por celda:   {t_celda:8.3f} s")
+    print(f"vectorizado: {t_vector:8.3f} s  ({t_celda / t_vector:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
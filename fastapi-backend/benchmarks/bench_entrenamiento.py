@@ -0,0 +1,58 @@
+"""Compara KMeans sobre todas las filas contra el entrenamiento agrupado (únicos + sample_weight).
+
+Uso (desde fastapi-backend/):
+    python -m benchmarks.bench_entrenamiento --filas 500000 --n-init 4
+"""
+import argparse
+import time
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+from mapeos.cuestionario import CUESTIONARIO
+from utils.entrenamiento_utils import ConfiguracionKMeans, agrupar_filas, entrenar_kmeans
+
+
+def generar_matriz(filas: int, perfiles: int, semilla: int = 42) -> pd.DataFrame:
+    """Respuestas 1–5 alrededor de unos pocos perfiles, como en encuestas reales con opciones ordinales."""
+    rng = np.random.default_rng(semilla)
+    claves = list(CUESTIONARIO.claves)
+    centros = rng.integers(1, 6, size=(perfiles, len(claves)))
+    ruido = rng.integers(-1, 2, size=(filas, len(claves))) * (rng.random((filas, len(claves))) < 0.05)
+    X = np.clip(centros[rng.integers(0, perfiles, size=filas)] + ruido, 1, 5)
+    return pd.DataFrame(X.astype(np.float64), columns=claves)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=500_000)
+    parser.add_argument("--perfiles", type=int, default=50)
+    parser.add_argument("--clusters", type=int, default=3)
+    parser.add_argument("--n-init", type=int, default=4)
+    args = parser.parse_args()
+
+    X = generar_matriz(args.filas, args.perfiles)
+    configuracion = ConfiguracionKMeans(n_init=args.n_init, agrupar_duplicados=True)
+
+    inicio = time.perf_counter()
+    modelo, etiquetas = entrenar_kmeans(X, args.clusters, configuracion)
+    t_agrupado = time.perf_counter() - inicio
+
+    # Referencia: la misma configuración sin agrupar duplicados, sobre todas las filas.
+    inicio = time.perf_counter()
+    sin_agrupar = replace(configuracion, agrupar_duplicados=False)
+    referencia, etiquetas_referencia = entrenar_kmeans(X, args.clusters, sin_agrupar)
+    t_completo = time.perf_counter() - inicio
+
+    np.testing.assert_array_equal(etiquetas, etiquetas_referencia)
+    np.testing.assert_allclose(modelo.cluster_centers_, referencia.cluster_centers_, rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(modelo.inertia_, referencia.inertia_, rtol=1e-9)
+
+    unicos = len(agrupar_filas(X.to_numpy())[0])
+    print(f"filas: {args.filas} ({unicos} vectores únicos) x {X.shape[1]} preguntas, n_init={args.n_init}")
+    print(f"todas las filas: {t_completo:8.3f} s")
+    print(f"agrupado:        {t_agrupado:8.3f} s  ({t_completo / t_agrupado:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
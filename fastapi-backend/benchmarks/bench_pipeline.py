@@ -0,0 +1,287 @@
+"""Benchmark reproducible del pipeline de clustering y de los endpoints HTTP.
+
+Genera encuestas sintéticas a partir de `mapeos.mapeos` (CSV y XLSX), mide cada
+etapa de /generar-set-numerico (lectura, limpieza, codificación, puntuación,
+aplicar_kmeans y exportación) y los endpoints a través de TestClient, y escribe
+un JSON con los resultados para comparar entre commits.
+
+Uso (desde fastapi-backend/):
+    python -m benchmarks.bench_pipeline --filas 1000 100000 1000000
+    python -m benchmarks.bench_pipeline --filas 1000 --formatos csv --salida antes.json
+    python -m benchmarks.bench_pipeline --comparar antes.json despues.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATOS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "datos")
+RESULTADOS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "resultados")
+FORMATOS = ("csv", "xlsx")
+SEMILLA = 42
+PROPORCION_INCOMPLETAS = 0.01
+FILAS_PREDICCION = 1000
+REPETICIONES_HTTP = 5
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def ruta_datos(filas: int, formato: str) -> str:
+    return os.path.join(DATOS_DIR, f"encuesta_{filas}_{SEMILLA}.{formato}")
+
+
+def generar_archivo(filas: int, formato: str) -> str:
+    """Escribe (una sola vez) la encuesta sintética; ~1% de filas quedan con una respuesta vacía."""
+    from benchmarks.bench_codificacion import generar_respuestas
+
+    ruta = ruta_datos(filas, formato)
+    if os.path.exists(ruta):
+        return ruta
+    os.makedirs(DATOS_DIR, exist_ok=True)
+
+    df = generar_respuestas(filas, SEMILLA)
+    rng = np.random.default_rng(SEMILLA)
+    incompletas = rng.choice(filas, size=int(filas * PROPORCION_INCOMPLETAS), replace=False)
+    columnas = rng.integers(1, df.shape[1], size=len(incompletas))
+    for fila, columna in zip(incompletas, columnas):
+        df.iat[fila, columna] = None
+
+    temporal = f"{ruta}.tmp.{formato}"
+    if formato == "csv":
+        df.to_csv(temporal, index=False)
+    else:
+        _escribir_xlsx(df, temporal)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def _escribir_xlsx(df, ruta: str):
+    # write_only evita mantener el libro completo en memoria con 1M de filas.
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append(list(df.columns))
+    for fila in df.itertuples(index=False, name=None):
+        hoja.append([None if valor is None else valor for valor in fila])
+    libro.save(ruta)
+
+
+def _medir_pipeline(ruta: str, modo_ingesta: str) -> dict:
+    """Se ejecuta en un proceso nuevo por caso para que el RSS pico sea el del caso."""
+    os.makedirs("cleaned_data")
+    from utils.metricas_utils import rss_pico_bytes
+    from utils.pipeline_utils import procesar_set_numerico
+
+    rss_inicial = rss_pico_bytes()
+    inicio = time.perf_counter()
+    respuesta = procesar_set_numerico(ruta, "bench", modo_ingesta=modo_ingesta)
+    total = time.perf_counter() - inicio
+
+    etapas = [
+        {**etapa, "filas_por_segundo": (etapa["filas"] / etapa["segundos"]) if etapa["filas"] and etapa["segundos"] else None}
+        for etapa in respuesta["metricas_etapas"]
+    ]
+    return {
+        "segundos": round(total, 6),
+        "rss_inicial_bytes": rss_inicial,
+        "rss_pico_bytes": rss_pico_bytes(),
+        "filas_validas": respuesta["rows"],
+        "etapas": etapas,
+    }
+
+
+def _medir_http(ruta: str, modo_ingesta: str) -> list:
+    """Latencia de los endpoints a través de TestClient."""
+    from fastapi.testclient import TestClient
+
+    import main
+    from benchmarks.bench_codificacion import generar_respuestas
+    from mapeos.cuestionario import CUESTIONARIO
+
+    resultados = []
+
+    def medir(nombre, metodo, filas, llamada, repeticiones=REPETICIONES_HTTP):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            respuesta = llamada()
+            tiempos.append(time.perf_counter() - inicio)
+            if respuesta.status_code >= 400:
+                raise RuntimeError(f"{metodo} {nombre}: {respuesta.status_code} {respuesta.text[:200]}")
+        resultados.append({
+            "endpoint": nombre,
+            "metodo": metodo,
+            "filas": filas,
+            "repeticiones": repeticiones,
+            "segundos_mediana": round(statistics.median(tiempos), 6),
+            "segundos_min": round(min(tiempos), 6),
+            "segundos_max": round(max(tiempos), 6),
+        })
+        return respuesta
+
+    with open(ruta, "rb") as archivo:
+        contenido = archivo.read()
+    nombre_archivo = os.path.basename(ruta)
+
+    with TestClient(main.app) as cliente:
+        # Sin caché (una sola corrida) y luego el acierto de caché.
+        respuesta = medir(
+            "/generar-set-numerico", "POST", None,
+            lambda: cliente.post("/generar-set-numerico", files={"file": (nombre_archivo, contenido)},
+                                 data={"modo_ingesta": modo_ingesta}),
+            repeticiones=1
+        ).json()
+        resultados[-1]["filas"] = respuesta["rows"]
+        resultados[-1]["etapas"] = respuesta["metricas_etapas"]
+        medir(
+            "/generar-set-numerico (caché)", "POST", respuesta["rows"],
+            lambda: cliente.post("/generar-set-numerico", files={"file": (nombre_archivo, contenido)},
+                                 data={"modo_ingesta": modo_ingesta})
+        )
+
+        archivo_resultado = respuesta["archivo_resultado"]
+        medir("/filas/{nombre_archivo}", "GET", 1000,
+              lambda: cliente.get(f"/filas/{archivo_resultado}", params={"desde": 0, "limite": 1000}))
+        # La primera descarga materializa el derivado; las siguientes lo sirven desde disco.
+        medir("/descargar-archivo/{nombre_archivo} (csv)", "GET", respuesta["rows"],
+              lambda: cliente.get(f"/descargar-archivo/{respuesta['archivo_cluster']}"), repeticiones=2)
+
+        modelo = os.path.basename(respuesta["modelo_guardado"])
+        encuestados = generar_respuestas(FILAS_PREDICCION, SEMILLA)
+        encuestados.columns = ["Marca temporal"] + list(CUESTIONARIO.claves)
+        lote = encuestados[list(CUESTIONARIO.claves)].to_dict(orient="records")
+        medir("/predecir-lote", "POST", FILAS_PREDICCION,
+              lambda: cliente.post("/predecir-lote", json={"modelo": modelo, "respuestas": lote}))
+        medir("/modelo-info/{nombre_modelo}", "GET", None, lambda: cliente.get(f"/modelo-info/{modelo}"))
+        medir("/modelos", "GET", None, lambda: cliente.get("/modelos"))
+        medir("/preguntas-categorizadas", "GET", None, lambda: cliente.get("/preguntas-categorizadas"))
+    return resultados
+
+
+def _en_directorio_temporal(funcion, *args):
+    """Ejecuta la medición con un directorio de trabajo descartable (cleaned_data, modelos, ...)."""
+    with tempfile.TemporaryDirectory(prefix="bench_kmeans_") as directorio:
+        os.chdir(directorio)
+        try:
+            return funcion(*args)
+        finally:
+            os.chdir(BACKEND_DIR)
+
+
+def _en_proceso_nuevo(funcion, *args):
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+        return pool.submit(_en_directorio_temporal, funcion, *args).result()
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(filas: list, formatos: list, modos: list, con_http: bool) -> dict:
+    import pandas as pd
+    import sklearn
+
+    casos = []
+    for n in filas:
+        for formato in formatos:
+            inicio = time.perf_counter()
+            ruta = generar_archivo(n, formato)
+            print(f"datos {n} {formato}: {time.perf_counter() - inicio:.1f} s", flush=True)
+            for modo in modos:
+                caso = {"filas": n, "formato": formato, "modo_ingesta": modo}
+                caso["pipeline"] = _en_proceso_nuevo(_medir_pipeline, ruta, modo)
+                if con_http:
+                    caso["http"] = _en_proceso_nuevo(_medir_http, ruta, modo)
+                casos.append(caso)
+                print(f"  {modo}: {caso['pipeline']['segundos']:.2f} s, "
+                      f"RSS pico {caso['pipeline']['rss_pico_bytes'] / 1024 ** 2:.0f} MiB", flush=True)
+
+    return {
+        "commit": _commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+        },
+        "casos": casos,
+    }
+
+
+def _indice(resultados: dict) -> dict:
+    """(filas, formato, modo, medición) -> segundos, para comparar dos corridas."""
+    indice = {}
+    for caso in resultados["casos"]:
+        base = (caso["filas"], caso["formato"], caso["modo_ingesta"])
+        indice[base + ("pipeline",)] = caso["pipeline"]["segundos"]
+        for etapa in caso["pipeline"]["etapas"]:
+            indice[base + (etapa["etapa"],)] = etapa["segundos"]
+        for medicion in caso.get("http", []):
+            indice[base + (f"{medicion['metodo']} {medicion['endpoint']}",)] = medicion["segundos_mediana"]
+    return indice
+
+
+def comparar(ruta_antes: str, ruta_despues: str):
+    with open(ruta_antes, encoding="utf-8") as archivo:
+        antes = json.load(archivo)
+    with open(ruta_despues, encoding="utf-8") as archivo:
+        despues = json.load(archivo)
+    indice_antes, indice_despues = _indice(antes), _indice(despues)
+    print(f"{antes.get('commit')} -> {despues.get('commit')}")
+    print(f"{'caso':<64} {'antes (s)':>10} {'después (s)':>12} {'cambio':>8}")
+    for clave in indice_despues:
+        if clave not in indice_antes:
+            continue
+        t_antes, t_despues = indice_antes[clave], indice_despues[clave]
+        cambio = f"{t_despues / t_antes:.2f}x" if t_antes else "-"
+        nombre = " ".join(str(parte) for parte in clave)
+        print(f"{nombre:<64} {t_antes:>10.4f} {t_despues:>12.4f} {cambio:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--formatos", nargs="+", choices=FORMATOS, default=list(FORMATOS))
+    parser.add_argument("--modos", nargs="+", choices=("completo", "por_lotes"), default=["completo"])
+    parser.add_argument("--sin-http", action="store_true", help="Omite las mediciones de endpoints")
+    parser.add_argument("--salida", help="JSON de resultados (por defecto benchmarks/resultados/<commit>.json)")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DESPUES"),
+                        help="Compara dos archivos de resultados en lugar de medir")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    resultados = ejecutar(args.filas, args.formatos, args.modos, not args.sin_http)
+    salida = args.salida or os.path.join(RESULTADOS_DIR, f"{resultados['commit'] or 'sin_commit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as archivo:
+        json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+    print(f"resultados: {salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Clasifica encuestas en lote con un modelo guardado en modelos/, sin levantar el servidor.
+
+Cada archivo (CSV o XLSX) se lee por bloques, se codifica con el mismo cuestionario
+del pipeline y cada encuestado recibe el centro más cercano del modelo; el resultado
+se escribe por bloques en <salida>/<archivo>_clasificado.<formato>.
+
+Uso (desde fastapi-backend/):
+    python clasificar_lote.py kmeans_model_20250710_120000.joblib encuestas_*.csv \\
+        --salida clasificados --formato parquet --conservar "Marca temporal" --procesos 4
+"""
+import argparse
+import sys
+import time
+
+from utils.ingesta_utils import TAMANO_LOTE
+from utils.lote_utils import FORMATOS_SALIDA, clasificar_archivos
+from utils.prediccion_utils import obtener_modelo
+
+
+def main(argumentos=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modelo", help="nombre del .joblib en modelos/")
+    parser.add_argument("archivos", nargs="+", help="archivos .csv o .xlsx a clasificar")
+    parser.add_argument("--salida", default="clasificados", help="directorio de salida")
+    parser.add_argument("--formato", choices=FORMATOS_SALIDA, default="csv")
+    parser.add_argument("--conservar", default="",
+                        help="columnas del archivo original a copiar en la salida, separadas por coma")
+    parser.add_argument("--tamano-lote", type=int, default=TAMANO_LOTE)
+    parser.add_argument("--procesos", type=int, default=None, help="por defecto, uno por núcleo")
+    args = parser.parse_args(argumentos)
+
+    try:
+        modelo = obtener_modelo(args.modelo)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    conservar = [col.strip() for col in args.conservar.split(",") if col.strip()]
+    inicio = time.perf_counter()
+    try:
+        resumenes = clasificar_archivos(args.archivos, modelo, args.salida, args.formato, conservar,
+                                        args.tamano_lote, args.procesos)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    segundos = time.perf_counter() - inicio
+
+    for resumen in resumenes:
+        print(f"✅ {resumen['archivo']} -> {resumen['salida']}: {resumen['filas']} filas, "
+              f"{resumen['sin_clasificar']} sin clasificar")
+    total = sum(resumen["filas"] for resumen in resumenes)
+    print(f"{total} filas en {segundos:.1f} s ({total / segundos if segundos else 0:,.0f} filas/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
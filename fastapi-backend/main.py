@@ -1,18 +1,37 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-import pandas as pd
-import shutil
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
+import asyncio
 import os
-import unicodedata
-import numpy as np
-from mapeos.mapeos import mapeos
-from utils.kmeans_utils import aplicar_kmeans
-from sklearn.base import BaseEstimator
-import joblib
-from sklearn.cluster import KMeans
-from typing import Optional
+from mapeos.cuestionario import CUESTIONARIO
+from utils.kmeans_utils import MODELOS_DIR, MODOS_ENTRENAMIENTO, registro_modelos
+from utils.deriva_utils import comparar_modelos
+from utils.entrenamiento_utils import ConfiguracionKMeans
+from utils.pipeline_utils import (
+    ErrorValidacion, artefactos_de, evaluar_k_archivo, procesar_set_numerico, validar_encabezado,
+    FILAS_PREVIEW, MODOS_INGESTA, UPLOAD_DIR
+)
+from utils.carga_utils import Carga, ErrorCarga, EXTENSIONES_CARGA, MAX_BYTES_CARGA
+from utils.prediccion_utils import obtener_modelo, predecir_respuestas
+from utils.seleccion_k_utils import MUESTRA_SILUETA
+from utils.cache_utils import (
+    CacheResultados, aplicar_retencion, clave_resultado,
+    MAX_BYTES_DATOS, MAX_EDAD_DATOS, MAX_BYTES_MODELOS, MAX_EDAD_MODELOS
+)
+from utils.exportacion_utils import leer_filas, materializar
+from utils.metricas_utils import PERFILES_DIR, RegistroMetricas, server_timing
+from utils.trabajos_utils import ColaTrabajos
+from pydantic import BaseModel
+from dataclasses import asdict
+from typing import Dict, List, Optional, Union
 import json
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 app = FastAPI()
 
@@ -24,239 +43,469 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = "cleaned_data"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-def limpiar_texto(texto):
-    texto = str(texto).strip().lower()
-    texto = texto.replace("¿", "").replace("?", "").replace("¡", "").replace("!", "")
-    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("utf-8")
-    return texto
-
-def clasificar_personalidad(df: pd.DataFrame) -> pd.DataFrame:
-    def determinar_clasificacion(puntaje):
-        if puntaje <= 90:
-            return 'Introvertido'
-        elif puntaje <= 135:
-            return 'Ambivertido'
-        else:
-            return 'Extrovertido'
-    df['Personalidad'] = df['Puntaje Total'].apply(determinar_clasificacion)
-    return df
-
-mapeos_numerados = {
-    f"p{i+1}": {"pregunta": pregunta, "opciones": opciones}
-    for i, (pregunta, opciones) in enumerate(mapeos.items())
-}
+MAX_FILAS_PAGINA = 10_000
+
+registro_metricas = RegistroMetricas()
+
+CACHE_DIR = "cache_resultados"
+cache_resultados = CacheResultados(CACHE_DIR)
+
+cola_trabajos = ColaTrabajos()
+
+carga = Carga(UPLOAD_DIR, validar_encabezado=validar_encabezado)
+RUTAS_CARGA = ("/generar-set-numerico", "/jobs", "/evaluar-k")
+# Holgura para los demás campos del formulario y los separadores multipart.
+MARGEN_FORMULARIO = 1024 ** 2
+
+class LimiteCarga:
+    """Corta con 413 las subidas que superan MAX_BYTES_CARGA mientras se recibe el cuerpo.
+
+    FastAPI (Starlette) lee el multipart entero, volcando el archivo a un temporal propio,
+    antes de que el endpoint llegue a Carga.guardar; el límite de bytes no puede esperar a
+    esa copia. Se rechaza por Content-Length antes de leer nada y, sin ese encabezado
+    (cuerpo chunked), contando los bytes a medida que llegan.
+    """
+
+    def __init__(self, app, max_bytes: Optional[int]):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if (not self.max_bytes or scope["type"] != "http" or scope["method"] != "POST"
+                or scope["path"] not in RUTAS_CARGA):
+            return await self.app(scope, receive, send)
+
+        limite = self.max_bytes + MARGEN_FORMULARIO
+        detalle = f"El archivo supera el límite de {self.max_bytes} bytes"
+        longitud = dict(scope["headers"]).get(b"content-length", b"")
+        if longitud.isdigit() and int(longitud) > limite:
+            return await JSONResponse(status_code=413, content={"detail": detalle})(scope, receive, send)
+
+        recibidos = 0
+
+        async def recibir():
+            nonlocal recibidos
+            mensaje = await receive()
+            if mensaje["type"] == "http.request":
+                recibidos += len(mensaje.get("body", b""))
+                if recibidos > limite:
+                    # Se lanza dentro de la lectura del formulario y responde como cualquier HTTPException.
+                    raise HTTPException(status_code=413, detail=detalle)
+            return mensaje
+
+        await self.app(scope, recibir, send)
+
+app.add_middleware(LimiteCarga, max_bytes=MAX_BYTES_CARGA)
+
+@app.middleware("http")
+async def medir_latencia(request: Request, call_next):
+    inicio = time.perf_counter()
+    respuesta = await call_next(request)
+    # Se etiqueta por la plantilla de la ruta (/jobs/{id_trabajo}) para no crear una serie por id.
+    ruta = request.scope.get("route")
+    registro_metricas.observar(
+        "http_solicitud_segundos", time.perf_counter() - inicio,
+        ayuda="Latencia de las solicitudes HTTP por endpoint.",
+        metodo=request.method, endpoint=getattr(ruta, "path", "sin_ruta"), estado=str(respuesta.status_code)
+    )
+    return respuesta
+
+@app.get("/metrics")
+def metricas():
+    """Métricas en formato de texto de Prometheus."""
+    return PlainTextResponse(registro_metricas.exponer(), media_type="text/plain; version=0.0.4")
 
 @app.get("/preguntas-categorizadas")
-def preguntas_categorizadas():
-    categorias = {
-        "Sociabilidad": [ "p1", "p8", "p17", "p18", "p19", "p21", "p24", "p27", "p34", "p35", "p39", "p43" ],
-        "Asertividad / Liderazgo": [ "p7", "p10", "p14", "p20", "p23", "p28", "p29", "p30", "p31", "p38", "p41" ],
-        "Nivel de actividad": [ "p2", "p4", "p11", "p12", "p13", "p16", "p22", "p26", "p33", "p40", "p45" ],
-        "Búsqueda de emociones": [ "p3", "p6", "p15", "p25", "p32", "p36", "p37", "p42", "p44" ],
-        "Afecto positivo": [ "p5", "p9", "p20", "p29", "p30" ]
-    }
-
-    p_to_categoria = {
-        clave: categoria
-        for categoria, claves in categorias.items()
-        for clave in claves
-    }
-
-    resultado = []
-    for clave, contenido in mapeos_numerados.items():
-        resultado.append({
-            "numero": clave,
-            "pregunta": contenido["pregunta"],
-            "categoria": p_to_categoria.get(clave, "No clasificada")
-        })
-
-    return resultado
+def preguntas_categorizadas(request: Request):
+    etag = CUESTIONARIO.etag_preguntas_categorizadas
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=CUESTIONARIO.preguntas_categorizadas_json,
+        media_type="application/json",
+        headers=headers
+    )
 
 @app.get("/descargar-archivo/{nombre_archivo}")
 def descargar_archivo(nombre_archivo: str):
-    ruta_archivo = os.path.join(UPLOAD_DIR, nombre_archivo)
-    if not os.path.exists(ruta_archivo):
+    ruta_archivo = materializar(UPLOAD_DIR, os.path.basename(nombre_archivo))
+    if ruta_archivo is None:
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     return FileResponse(path=ruta_archivo, filename=nombre_archivo, media_type='application/octet-stream')
 
+def _respuesta_json(contenido) -> Response:
+    # orjson (opcional) serializa las páginas columnares mucho más rápido que json estándar.
+    if orjson is not None:
+        return Response(content=orjson.dumps(contenido, default=jsonable_encoder), media_type="application/json")
+    return JSONResponse(content=jsonable_encoder(contenido))
+
+@app.get("/filas/{nombre_archivo}")
+def obtener_filas(
+    nombre_archivo: str,
+    desde: int = Query(0, ge=0),
+    limite: int = Query(FILAS_PREVIEW, ge=1, le=MAX_FILAS_PAGINA),
+    columnas: Optional[List[str]] = Query(None)
+):
+    """Filas paginadas de un resultado (archivo_resultado o archivo_limpio) en formato columnar.
+
+    `columnas` se repite una vez por columna (`?columnas=a&columnas=b`): los encabezados
+    del cuestionario pueden contener comas.
+    """
+    ruta = os.path.join(UPLOAD_DIR, os.path.basename(nombre_archivo))
+    if not nombre_archivo.endswith(".parquet") or not os.path.exists(ruta):
+        raise HTTPException(status_code=404, detail="Resultado no encontrado")
+    try:
+        return _respuesta_json(leer_filas(ruta, desde, limite, columnas))
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Columna no encontrada: {str(e)}")
+
+@app.get("/perfiles/{nombre_archivo}")
+def descargar_perfil(nombre_archivo: str):
+    """Volcado de cProfile de una solicitud con `perfilar`; se abre con `python -m pstats`."""
+    ruta = os.path.join(PERFILES_DIR, os.path.basename(nombre_archivo))
+    if not os.path.exists(ruta):
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return FileResponse(path=ruta, filename=os.path.basename(ruta), media_type='application/octet-stream')
+
 @app.get("/modelos")
-def listar_modelos():
-    modelos_dir = "modelos"
-    if not os.path.exists(modelos_dir):
-        return JSONResponse(content={"modelos": []})
-    archivos = [archivo for archivo in os.listdir(modelos_dir) if archivo.endswith(".joblib")]
-    archivos.sort(reverse=True)
-    return {"modelos": archivos}
+def listar_modelos(
+    pagina: int = Query(1, ge=1),
+    por_pagina: Optional[int] = Query(None, ge=1),
+    n_clusters: Optional[int] = None,
+    buscar: Optional[str] = None
+):
+    archivos = registro_modelos.listar(n_clusters=n_clusters, buscar=buscar)
+    total = len(archivos)
+    if por_pagina:
+        inicio = (pagina - 1) * por_pagina
+        archivos = archivos[inicio:inicio + por_pagina]
+    return {"modelos": archivos, "total": total, "pagina": pagina, "por_pagina": por_pagina}
 
 @app.get("/modelo-info/{nombre_modelo}")
 def obtener_info_modelo(nombre_modelo: str):
-    ruta = os.path.join("modelos", nombre_modelo)
-    if not os.path.exists(ruta):
-        raise HTTPException(status_code=404, detail="Modelo no encontrado")
     try:
-        modelo: BaseEstimator = joblib.load(ruta)
-        if not isinstance(modelo, KMeans):
-            raise HTTPException(status_code=400, detail="El archivo no es un modelo KMeans")
-        return {
-            "n_clusters": modelo.n_clusters,
-            "inertia": modelo.inertia_,
-            "centros": modelo.cluster_centers_.tolist()
-        }
+        manifiesto = registro_modelos.obtener(nombre_modelo)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Modelo no encontrado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al cargar el modelo: {str(e)}")
+    return {
+        "n_clusters": manifiesto["n_clusters"],
+        "inertia": manifiesto["inertia"],
+        "centros": manifiesto["centros"],
+        "columnas": manifiesto["columnas"],
+        "filas_entrenamiento": manifiesto["filas_entrenamiento"],
+        "fecha": manifiesto["fecha"],
+        "hash_datos": manifiesto["hash_datos"]
+    }
 
-MINIMOS_POR_CATEGORIA = {
-    "Sociabilidad": 6,
-    "Asertividad / Liderazgo": 6,
-    "Nivel de actividad": 6,
-    "Búsqueda de emociones": 5,
-    "Afecto positivo": 3
-}
-
-CATEGORIAS = {
-    "Sociabilidad": [ "p1", "p8", "p17", "p18", "p19", "p21", "p24", "p27", "p34", "p35", "p39", "p43" ],
-    "Asertividad / Liderazgo": [ "p7", "p10", "p14", "p20", "p23", "p28", "p29", "p30", "p31", "p38", "p41" ],
-    "Nivel de actividad": [ "p2", "p4", "p11", "p12", "p13", "p16", "p22", "p26", "p33", "p40", "p45" ],
-    "Búsqueda de emociones": [ "p3", "p6", "p15", "p25", "p32", "p36", "p37", "p42", "p44" ],
-    "Afecto positivo": [ "p5", "p9", "p20", "p29", "p30" ]
-}
-
-def validar_preguntas_por_categoria(df_columnas):
-    errores = []
-    for categoria, preguntas in CATEGORIAS.items():
-        seleccionadas = [p for p in preguntas if p in df_columnas]
-        if len(seleccionadas) < MINIMOS_POR_CATEGORIA[categoria]:
-            errores.append(f"{categoria}: mínimo requerido es {MINIMOS_POR_CATEGORIA[categoria]}, seleccionadas: {len(seleccionadas)}")
-    return errores
-
-mapeos_numerados = {
-    f"p{i+1}": {"pregunta": pregunta, "opciones": opciones}
-    for i, (pregunta, opciones) in enumerate(mapeos.items())
-}
+@app.get("/comparar-modelos")
+def comparar_modelos_guardados(referencia: str, nuevo: str):
+    """Desplazamiento de centros y estabilidad de etiquetas entre dos modelos guardados (ver deriva_utils)."""
+    try:
+        return comparar_modelos(registro_modelos, referencia, nuevo)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Modelo no encontrado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class SolicitudPrediccion(BaseModel):
+    modelo: str
+    respuestas: Dict[str, Union[int, str]]
+
+class SolicitudPrediccionLote(BaseModel):
+    modelo: str
+    respuestas: List[Dict[str, Union[int, str]]]
+
+def _predecir(nombre_modelo: str, respuestas: List[Dict]) -> List[Dict]:
+    try:
+        modelo = obtener_modelo(nombre_modelo)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Modelo no encontrado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return predecir_respuestas(modelo, respuestas)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": "Respuestas inválidas.", "detalles": e.args[0]})
+
+@app.post("/predecir")
+def predecir(solicitud: SolicitudPrediccion):
+    resultado = _predecir(solicitud.modelo, [solicitud.respuestas])[0]
+    return {"modelo": solicitud.modelo, **resultado}
+
+@app.post("/predecir-lote")
+def predecir_lote(solicitud: SolicitudPrediccionLote):
+    return {"modelo": solicitud.modelo, "resultados": _predecir(solicitud.modelo, solicitud.respuestas)}
+
+def _leer_variables(variables: Optional[str]):
+    if not variables:
+        return None
+    try:
+        return json.loads(variables)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error al leer variables seleccionadas: {str(e)}")
+
+def _validar_archivo(file: UploadFile, modo_ingesta: str):
+    if not file.filename or not file.filename.endswith(EXTENSIONES_CARGA):
+        raise HTTPException(status_code=400, detail="Formato de archivo no válido")
+    if modo_ingesta not in MODOS_INGESTA:
+        raise HTTPException(status_code=400, detail=f"Modo de ingesta no válido. Opciones: {', '.join(MODOS_INGESTA)}")
+
+async def _guardar_archivo(file: UploadFile):
+    """Guarda el archivo subido en un archivo propio y devuelve su ruta y el hash SHA-256 del contenido."""
+    try:
+        return await carga.guardar(file, file.filename)
+    except ErrorCarga as e:
+        raise HTTPException(status_code=e.estado, detail=e.detalle)
+    except ErrorValidacion as e:
+        raise HTTPException(status_code=400, detail=e.detalle)
+
+def _aplicar_retencion():
+    aplicar_retencion(UPLOAD_DIR, MAX_BYTES_DATOS, MAX_EDAD_DATOS)
+    aplicar_retencion(CACHE_DIR, MAX_BYTES_DATOS, MAX_EDAD_DATOS)
+    aplicar_retencion(PERFILES_DIR, MAX_BYTES_DATOS, MAX_EDAD_DATOS)
+    aplicar_retencion(MODELOS_DIR, MAX_BYTES_MODELOS, MAX_EDAD_MODELOS, agrupar_por_nombre=True)
+
+@app.post("/evaluar-k")
+async def evaluar_numero_clusters(
+    file: UploadFile = File(...),
+    variables: Optional[str] = Form(None),
+    modo_ingesta: str = Form("completo"),
+    k_min: int = Form(1),
+    k_max: int = Form(10),
+    muestra_silueta: int = Form(MUESTRA_SILUETA)
+):
+    """Evalúa el rango de k; el resultado queda en caché por contenido del archivo y parámetros."""
+    _validar_archivo(file, modo_ingesta)
+    variables_usar = _leer_variables(variables)
+    file_path, hash_archivo = await _guardar_archivo(file)
+
+    # Se consulta en este proceso antes de encolar: la caché de evaluar_k vive en cada trabajador.
+    clave = clave_resultado(
+        hash_archivo,
+        operacion="evaluar-k",
+        variables=variables_usar,
+        modo_ingesta=modo_ingesta,
+        k_min=k_min,
+        k_max=k_max,
+        muestra_silueta=muestra_silueta
+    )
+    respuesta_cache = cache_resultados.obtener(clave)
+    if respuesta_cache is not None:
+        return {**respuesta_cache, "desde_cache": True}
+
+    # Corre en la cola de trabajos: comparte el límite de KMEANS_MAX_TRABAJOS con los entrenamientos.
+    parametros = {
+        "file_path": file_path,
+        "modo_ingesta": modo_ingesta,
+        "variables_usar": variables_usar,
+        "k_min": k_min,
+        "k_max": k_max,
+        "muestra_silueta": muestra_silueta
+    }
+    id_trabajo = cola_trabajos.enviar(evaluar_k_archivo, parametros)
+    try:
+        evaluacion = await asyncio.wrap_future(cola_trabajos.futuro(id_trabajo))
+    except ErrorValidacion as e:
+        raise HTTPException(status_code=400, detail=e.detalle)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al evaluar el número de clusters: {str(e)}")
+    # La evaluación no deja archivos: la entrada solo caduca por retención de CACHE_DIR.
+    cache_resultados.guardar(clave, evaluacion, [])
+    return {**evaluacion, "desde_cache": False}
+
+async def _parametros_entrenamiento(file: UploadFile, variables: Optional[str], modo_ingesta: str,
+                                     modo_entrenamiento: str, modelo_base: Optional[str],
+                                     n_clusters: int, seleccionar_k: bool, filas_preview: int,
+                                     configuracion: ConfiguracionKMeans, umbral_deriva: Optional[float],
+                                     modelo_referencia: Optional[str]):
+    """Valida la solicitud, guarda el archivo y arma los parámetros de procesar_set_numerico.
+
+    Devuelve la clave de caché y los parámetros del pipeline.
+    """
+    _validar_archivo(file, modo_ingesta)
+    if modo_entrenamiento not in MODOS_ENTRENAMIENTO:
+        raise HTTPException(status_code=400, detail=f"Modo de entrenamiento no válido. Opciones: {', '.join(MODOS_ENTRENAMIENTO)}")
+    if modelo_base and not os.path.exists(os.path.join(MODELOS_DIR, os.path.basename(modelo_base))):
+        raise HTTPException(status_code=404, detail="Modelo base no encontrado")
+    if modelo_referencia and not os.path.exists(os.path.join(MODELOS_DIR, os.path.basename(modelo_referencia))):
+        raise HTTPException(status_code=404, detail="Modelo de referencia no encontrado")
+    if umbral_deriva is not None and umbral_deriva < 0:
+        raise HTTPException(status_code=400, detail="umbral_deriva no puede ser negativo")
+    if n_clusters < 1:
+        raise HTTPException(status_code=400, detail="n_clusters debe ser mayor o igual a 1")
+    if not 0 <= filas_preview <= MAX_FILAS_PAGINA:
+        raise HTTPException(status_code=400, detail=f"filas_preview debe estar entre 0 y {MAX_FILAS_PAGINA}")
+    errores_configuracion = configuracion.validar()
+    if errores_configuracion:
+        raise HTTPException(status_code=400, detail=errores_configuracion)
+    variables_usar = _leer_variables(variables)
+
+    file_path, hash_archivo = await _guardar_archivo(file)
+    clave = clave_resultado(
+        hash_archivo,
+        variables=variables_usar,
+        n_clusters=n_clusters,
+        seleccionar_k=seleccionar_k,
+        filas_preview=filas_preview,
+        modo_ingesta=modo_ingesta,
+        modo_entrenamiento=modo_entrenamiento,
+        modelo_base=modelo_base,
+        configuracion=asdict(configuracion),
+        umbral_deriva=umbral_deriva,
+        modelo_referencia=modelo_referencia
+    )
+    parametros = {
+        "file_path": file_path,
+        # El sufijo evita que dos archivos distintos con el mismo nombre se pisen los artefactos.
+        "nombre_sin_ext": f"{os.path.splitext(os.path.basename(file.filename))[0]}_{clave[:8]}",
+        "variables_usar": variables_usar,
+        "modo_ingesta": modo_ingesta,
+        "modo_entrenamiento": modo_entrenamiento,
+        "modelo_base": modelo_base,
+        "n_clusters": n_clusters,
+        "seleccionar_k": seleccionar_k,
+        "filas_preview": filas_preview,
+        "configuracion": configuracion,
+        "umbral_deriva": umbral_deriva,
+        "modelo_referencia": modelo_referencia
+    }
+    return clave, parametros
+
+def _registrar_etapas(etapas: List[Dict]):
+    for etapa in etapas:
+        registro_metricas.observar(
+            "pipeline_etapa_segundos", etapa["segundos"],
+            ayuda="Duración de cada etapa de /generar-set-numerico.", etapa=etapa["etapa"]
+        )
+        if etapa["filas"] is not None:
+            registro_metricas.incrementar(
+                "pipeline_etapa_filas_total", etapa["filas"],
+                ayuda="Filas procesadas por etapa.", etapa=etapa["etapa"]
+            )
+
+def _al_terminar(clave: str):
+    def guardar(respuesta: dict):
+        _registrar_etapas(respuesta.get("metricas_etapas", []))
+        deriva = respuesta.get("deriva") or {}
+        if "modelo_guardado" in deriva:
+            registro_metricas.incrementar(
+                "modelos_entrenados_total", ayuda="Modelos entrenados según si se guardaron o se reutilizó la referencia.",
+                guardado=str(deriva["modelo_guardado"]).lower()
+            )
+        # El perfil pertenece a una solicitud concreta; no se guarda con el resultado.
+        respuesta = {k: v for k, v in respuesta.items() if k != "archivo_perfil"}
+        cache_resultados.guardar(clave, respuesta, artefactos_de(respuesta))
+        _aplicar_retencion()
+    return guardar
 
 @app.post("/generar-set-numerico")
 async def generar_set_numerico(
+    response: Response,
     file: UploadFile = File(...),
-    variables: Optional[str] = Form(None)
+    variables: Optional[str] = Form(None),
+    modo_ingesta: str = Form("completo"),
+    modo_entrenamiento: str = Form("completo"),
+    modelo_base: Optional[str] = Form(None),
+    n_clusters: int = Form(3),
+    seleccionar_k: bool = Form(False),
+    filas_preview: int = Form(FILAS_PREVIEW),
+    perfilar: bool = Form(False),
+    algoritmo: Optional[str] = Form(None),
+    inicializacion: str = Form("k-means++"),
+    n_init: Optional[int] = Form(None),
+    max_iter: int = Form(300),
+    tol: float = Form(1e-4),
+    agrupar_duplicados: bool = Form(False),
+    umbral_deriva: Optional[float] = Form(None),
+    modelo_referencia: Optional[str] = Form(None)
 ):
-    if not file.filename.endswith(('.csv', '.xlsx')):
-        raise HTTPException(status_code=400, detail="Formato de archivo no válido")
-
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    """Con `perfilar` la solicitud no usa la caché y devuelve `archivo_perfil` (descargable en /perfiles).
+
+    `algoritmo`, `inicializacion`, `n_init`, `max_iter`, `tol` y `agrupar_duplicados`
+    configuran el entrenamiento completo (ver entrenamiento_utils.ConfiguracionKMeans).
+    Con `umbral_deriva` (p. ej. 0.05) el modelo nuevo no se guarda si sus centros apenas se
+    movieron respecto de `modelo_referencia` o del último modelo compatible (ver `deriva`).
+    """
+    configuracion = ConfiguracionKMeans(algoritmo, inicializacion, n_init, max_iter, tol, agrupar_duplicados)
+    clave, parametros = await _parametros_entrenamiento(
+        file, variables, modo_ingesta,
+        modo_entrenamiento, modelo_base, n_clusters, seleccionar_k, filas_preview, configuracion,
+        umbral_deriva, modelo_referencia
+    )
+    respuesta_cache = None if perfilar else cache_resultados.obtener(clave)
+    if respuesta_cache is not None:
+        return {**respuesta_cache, "desde_cache": True}
+
+    # El trabajo corre en el pool de procesos para no bloquear el event loop.
+    id_trabajo = cola_trabajos.enviar(procesar_set_numerico, parametros, _al_terminar(clave), con_perfil=perfilar)
+    try:
+        respuesta = await asyncio.wrap_future(cola_trabajos.futuro(id_trabajo))
+    except ErrorValidacion as e:
+        raise HTTPException(status_code=400, detail=e.detalle)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al generar el set numérico: {str(e)}")
+    response.headers["Server-Timing"] = server_timing(respuesta["metricas_etapas"])
+    return {**respuesta, "desde_cache": False}
 
+@app.post("/jobs")
+async def crear_trabajo(
+    file: UploadFile = File(...),
+    variables: Optional[str] = Form(None),
+    modo_ingesta: str = Form("completo"),
+    modo_entrenamiento: str = Form("completo"),
+    modelo_base: Optional[str] = Form(None),
+    n_clusters: int = Form(3),
+    seleccionar_k: bool = Form(False),
+    filas_preview: int = Form(FILAS_PREVIEW),
+    perfilar: bool = Form(False),
+    algoritmo: Optional[str] = Form(None),
+    inicializacion: str = Form("k-means++"),
+    n_init: Optional[int] = Form(None),
+    max_iter: int = Form(300),
+    tol: float = Form(1e-4),
+    agrupar_duplicados: bool = Form(False),
+    umbral_deriva: Optional[float] = Form(None),
+    modelo_referencia: Optional[str] = Form(None)
+):
+    """Versión en segundo plano de /generar-set-numerico; el avance se consulta en /jobs/{id}."""
+    configuracion = ConfiguracionKMeans(algoritmo, inicializacion, n_init, max_iter, tol, agrupar_duplicados)
+    clave, parametros = await _parametros_entrenamiento(
+        file, variables, modo_ingesta, modo_entrenamiento, modelo_base, n_clusters, seleccionar_k, filas_preview,
+        configuracion, umbral_deriva, modelo_referencia
+    )
+    respuesta_cache = None if perfilar else cache_resultados.obtener(clave)
+    if respuesta_cache is not None:
+        return {"id": None, "estado": "completado", "resultado": {**respuesta_cache, "desde_cache": True}}
+
+    id_trabajo = cola_trabajos.enviar(procesar_set_numerico, parametros, _al_terminar(clave), con_perfil=perfilar)
+    return {"id": id_trabajo, "estado": "en_cola"}
+
+@app.get("/jobs/{id_trabajo}")
+def estado_trabajo(id_trabajo: str):
     try:
-        df = pd.read_csv(file_path) if file.filename.endswith('.csv') else pd.read_excel(file_path)
-
-        df.columns = df.columns.str.strip()
-        df = df.dropna()
-        df = df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
-        df = df.applymap(lambda x: x.lower() if isinstance(x, str) else x)
-
-        nombre_sin_ext = os.path.splitext(file.filename)[0]
-        cleaned_path = os.path.join(UPLOAD_DIR, f"limpio_{nombre_sin_ext}.xlsx")
-        df.to_excel(cleaned_path, index=False, engine="openpyxl")
-
-        df_numerico = df.copy()
-        df_numerico.columns = [limpiar_texto(col) for col in df_numerico.columns]
-
-        mapa_columnas = {
-            limpiar_texto(contenido["pregunta"]): clave
-            for clave, contenido in mapeos_numerados.items()
-        }
-        df_numerico.rename(columns=lambda col: mapa_columnas.get(col, col), inplace=True)
-
-        mapeos_normalizados = {
-            limpiar_texto(clave): {
-                limpiar_texto(resp): val for resp, val in contenido["opciones"].items()
-            }
-            for clave, contenido in mapeos_numerados.items()
-        }
-
-        for pregunta_norm, opciones in mapeos_normalizados.items():
-            if pregunta_norm in df_numerico.columns:
-                df_numerico[pregunta_norm] = df_numerico[pregunta_norm].map(
-                    lambda x: opciones.get(limpiar_texto(x), None)
-                )
-
-        variables_usar = None
-        if variables:
-            try:
-                variables_usar = json.loads(variables)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Error al leer variables seleccionadas: {str(e)}")
-
-        columnas_existentes = [col for col in mapeos_normalizados if col in df_numerico.columns]
-
-        if variables_usar:
-            columnas_existentes = [col for col in variables_usar if col in df_numerico.columns]
-            if not columnas_existentes:
-                raise HTTPException(status_code=400, detail="No hay columnas válidas seleccionadas.")
-
-            errores_validacion = validar_preguntas_por_categoria(columnas_existentes)
-            if errores_validacion:
-                raise HTTPException(status_code=400, detail={
-                    "error": "No se cumplen los mínimos por categoría.",
-                    "detalles": errores_validacion
-                })
-
-        df_filtrado = df_numerico[columnas_existentes].copy()
-
-        # ✅ Agregar puntajes por categoría (esto alimenta la gráfica radar)
-        for categoria, preguntas in CATEGORIAS.items():
-            columnas_categoria = [p for p in preguntas if p in df_filtrado.columns]
-            if columnas_categoria:
-                df_filtrado[categoria] = df_filtrado[columnas_categoria].sum(axis=1)
-
-        df_filtrado["Puntaje Total"] = df_filtrado[columnas_existentes].sum(axis=1)
-
-        total_original = df_filtrado.shape[0]
-        df_resultado = clasificar_personalidad(df_filtrado)
-        df_resultado["Clasificacion"] = df_resultado["Personalidad"]
-        df_resultado = df_resultado.dropna()
-        total_final = df_resultado.shape[0]
-        eliminados = total_original - total_final
-
-        columnas_excluir = ["Puntaje Total", "Personalidad", "Clasificacion"]
-        if variables_usar:
-            columnas_excluir += [col for col in df_resultado.columns if col.startswith("p") and col not in variables_usar]
-
-        df_resultado, ruta_modelo = aplicar_kmeans(df_resultado, columnas_a_excluir=columnas_excluir)
-
-        promedios = df_resultado.groupby("Cluster")["Puntaje Total"].mean().sort_values()
-        orden_clusters = promedios.index.tolist()
-        mapeo_clusters = {
-            orden_clusters[0]: "Introvertido",
-            orden_clusters[1]: "Ambivertido",
-            orden_clusters[2]: "Extrovertido"
-        }
-        df_resultado["Prediccion_Personalidad"] = df_resultado["Cluster"].map(mapeo_clusters)
-
-        numerico_path = os.path.join(UPLOAD_DIR, f"numerico_{nombre_sin_ext}.xlsx")
-        cluster_path = os.path.join(UPLOAD_DIR, f"clusterizado_{nombre_sin_ext}.csv")
-        prediccion_path = os.path.join(UPLOAD_DIR, f"prediccion_{nombre_sin_ext}.xlsx")
-
-        df_resultado.to_excel(numerico_path, index=False, engine="openpyxl")
-        df_resultado.to_csv(cluster_path, index=False, encoding='utf-8-sig')
-        df_resultado.to_excel(prediccion_path, index=False, engine="openpyxl")
-
-        return {
-            "message": "Archivo procesado correctamente",
-            "rows": total_final,
-            "eliminados_por_nan": eliminados,
-            "preview_limpio": df.replace({pd.NA: None, np.nan: None}).to_dict(orient="records"),
-            "preview_numerico": df_resultado.replace({pd.NA: None, np.nan: None}).to_dict(orient="records"),
-            "columns_limpio": list(df.columns),
-            "columns_numerico": list(df_resultado.columns),
-            "archivo_cluster": f"clusterizado_{nombre_sin_ext}.csv",
-            "archivo_numerico": f"numerico_{nombre_sin_ext}.xlsx",
-            "archivo_prediccion": f"prediccion_{nombre_sin_ext}.xlsx",
-            "modelo_guardado": ruta_modelo
-        }
+        return cola_trabajos.estado(id_trabajo)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al generar el set numérico: {str(e)}")
\ No newline at end of file
+@app.delete("/jobs/{id_trabajo}")
+def cancelar_trabajo(id_trabajo: str):
+    try:
+        cancelado = cola_trabajos.cancelar(id_trabajo)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if not cancelado:
+        raise HTTPException(status_code=409, detail="El trabajo ya terminó")
+    return {"id": id_trabajo, "cancelacion_solicitada": True}
+
+@app.on_event("shutdown")
+def cerrar_cola_trabajos():
+    cola_trabajos.cerrar()
@@ -0,0 +1,115 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+import numpy as np
+
+from mapeos.mapeos import mapeos
+from utils.codificacion_utils import limpiar_texto
+
+CATEGORIAS = {
+    "Sociabilidad": [ "p1", "p8", "p17", "p18", "p19", "p21", "p24", "p27", "p34", "p35", "p39", "p43" ],
+    "Asertividad / Liderazgo": [ "p7", "p10", "p14", "p20", "p23", "p28", "p29", "p30", "p31", "p38", "p41" ],
+    "Nivel de actividad": [ "p2", "p4", "p11", "p12", "p13", "p16", "p22", "p26", "p33", "p40", "p45" ],
+    "Búsqueda de emociones": [ "p3", "p6", "p15", "p25", "p32", "p36", "p37", "p42", "p44" ],
+    "Afecto positivo": [ "p5", "p9", "p20", "p29", "p30" ]
+}
+
+# Puntaje Total <= 90 -> Introvertido, <= 135 -> Ambivertido, > 135 -> Extrovertido.
+UMBRALES_PERSONALIDAD = (90, 135)
+ETIQUETAS_PERSONALIDAD = ("Introvertido", "Ambivertido", "Extrovertido")
+
+MINIMOS_POR_CATEGORIA = {
+    "Sociabilidad": 6,
+    "Asertividad / Liderazgo": 6,
+    "Nivel de actividad": 6,
+    "Búsqueda de emociones": 5,
+    "Afecto positivo": 3
+}
+
+
+def _arreglo_inmutable(valores, dtype) -> np.ndarray:
+    arreglo = np.array(valores, dtype=dtype)
+    arreglo.setflags(write=False)
+    return arreglo
+
+
+@dataclass(frozen=True)
+class Cuestionario:
+    """Registro inmutable del cuestionario, construido una sola vez al importar el módulo."""
+
+    claves: Tuple[str, ...]
+    preguntas: Mapping[str, str]
+    opciones: Mapping[str, Mapping[str, int]]
+    mapa_columnas: Mapping[str, str]
+    opciones_normalizadas: Mapping[str, Mapping[str, int]]
+    categorias: Mapping[str, Tuple[str, ...]]
+    matriz_categorias: np.ndarray
+    umbrales_personalidad: np.ndarray
+    etiquetas_personalidad: Tuple[str, ...]
+    minimos_por_categoria: Mapping[str, int]
+    preguntas_categorizadas_json: bytes
+    etag_preguntas_categorizadas: str
+
+
+def construir_cuestionario(mapeos: dict, categorias: dict, minimos: dict,
+                           umbrales=UMBRALES_PERSONALIDAD, etiquetas=ETIQUETAS_PERSONALIDAD) -> Cuestionario:
+    if len(etiquetas) != len(umbrales) + 1:
+        raise ValueError("Se necesita una etiqueta más que umbrales de clasificación")
+    if list(umbrales) != sorted(umbrales):
+        raise ValueError("Los umbrales de clasificación deben ser crecientes")
+
+    claves = tuple(f"p{i+1}" for i in range(len(mapeos)))
+    preguntas = dict(zip(claves, mapeos.keys()))
+    opciones = {clave: MappingProxyType(dict(ops)) for clave, ops in zip(claves, mapeos.values())}
+
+    opciones_normalizadas = {
+        clave: MappingProxyType({limpiar_texto(resp): val for resp, val in ops.items()})
+        for clave, ops in opciones.items()
+    }
+    posiciones = {clave: i for i, clave in enumerate(claves)}
+
+    p_to_categoria = {
+        clave: categoria
+        for categoria, claves_cat in categorias.items()
+        for clave in claves_cat
+    }
+    preguntas_categorizadas = [
+        {
+            "numero": clave,
+            "pregunta": preguntas[clave],
+            "categoria": p_to_categoria.get(clave, "No clasificada")
+        }
+        for clave in claves
+    ]
+    contenido = json.dumps(preguntas_categorizadas, ensure_ascii=False).encode("utf-8")
+
+    # Pertenencia pregunta x categoría (una pregunta puede sumar en varias categorías).
+    matriz_categorias = np.zeros((len(claves), len(categorias)), dtype=np.int16)
+    for j, claves_cat in enumerate(categorias.values()):
+        matriz_categorias[[posiciones[c] for c in claves_cat], j] = 1
+    matriz_categorias.setflags(write=False)
+
+    return Cuestionario(
+        claves=claves,
+        preguntas=MappingProxyType(preguntas),
+        opciones=MappingProxyType(opciones),
+        mapa_columnas=MappingProxyType({
+            limpiar_texto(pregunta): clave for clave, pregunta in preguntas.items()
+        }),
+        opciones_normalizadas=MappingProxyType(opciones_normalizadas),
+        categorias=MappingProxyType({
+            categoria: tuple(claves_cat) for categoria, claves_cat in categorias.items()
+        }),
+        matriz_categorias=matriz_categorias,
+        umbrales_personalidad=_arreglo_inmutable(umbrales, np.int16),
+        etiquetas_personalidad=tuple(etiquetas),
+        minimos_por_categoria=MappingProxyType(dict(minimos)),
+        preguntas_categorizadas_json=contenido,
+        etag_preguntas_categorizadas=f'"{hashlib.sha1(contenido).hexdigest()}"',
+    )
+
+
+CUESTIONARIO = construir_cuestionario(mapeos, CATEGORIAS, MINIMOS_POR_CATEGORIA)
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+
+def _entero_env(nombre: str, defecto: Optional[int]) -> Optional[int]:
+    valor = os.environ.get(nombre)
+    if valor is None or valor == "":
+        return defecto
+    return int(valor) or None
+
+
+# Límites de retención (0 en la variable de entorno desactiva el límite).
+MAX_BYTES_DATOS = _entero_env("KMEANS_MAX_BYTES_DATOS", 1024 ** 3)
+MAX_EDAD_DATOS = _entero_env("KMEANS_MAX_EDAD_DATOS", 7 * 24 * 3600)
+MAX_BYTES_MODELOS = _entero_env("KMEANS_MAX_BYTES_MODELOS", 512 * 1024 ** 2)
+MAX_EDAD_MODELOS = _entero_env("KMEANS_MAX_EDAD_MODELOS", None)
+
+
+def clave_resultado(hash_archivo: str, **parametros) -> str:
+    """Clave de caché: contenido del archivo más los parámetros que cambian el resultado."""
+    contenido = json.dumps({"archivo": hash_archivo, **parametros}, sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class CacheResultados:
+    """Resultados de /generar-set-numerico direccionados por contenido.
+
+    Cada entrada es un JSON con la respuesta y las rutas de los artefactos que
+    referencia; si alguno de ellos ya no existe (p. ej. por retención), la entrada
+    se descarta y se vuelve a entrenar.
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    def obtener(self, clave: str) -> Optional[Dict]:
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, encoding="utf-8") as archivo:
+                entrada = json.load(archivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not all(os.path.exists(r) for r in entrada["artefactos"]):
+            os.remove(ruta)
+            return None
+        os.utime(ruta)
+        return entrada["respuesta"]
+
+    def guardar(self, clave: str, respuesta: Dict, artefactos: Iterable[str]):
+        ruta = self._ruta(clave)
+        temporal = f"{ruta}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump({"respuesta": respuesta, "artefactos": list(artefactos)}, archivo, ensure_ascii=False, default=str)
+        os.replace(temporal, ruta)
+
+
+def aplicar_retencion(directorio: str, max_bytes: Optional[int] = None, max_edad: Optional[int] = None,
+                      agrupar_por_nombre: bool = False) -> List[str]:
+    """Elimina archivos más antiguos que `max_edad` segundos y, si el directorio sigue
+    superando `max_bytes`, los menos recientes hasta quedar por debajo del límite.
+
+    Con `agrupar_por_nombre` los archivos que comparten nombre base (modelo .joblib y
+    su manifiesto .json) se tratan como una sola unidad.
+    """
+    if not os.path.isdir(directorio) or (max_bytes is None and max_edad is None):
+        return []
+
+    grupos: Dict[str, list] = {}
+    for entrada in os.scandir(directorio):
+        if not entrada.is_file():
+            continue
+        clave = os.path.splitext(entrada.name)[0] if agrupar_por_nombre else entrada.name
+        grupos.setdefault(clave, []).append(entrada)
+
+    ahora = time.time()
+    unidades = sorted(
+        (
+            max(e.stat().st_mtime for e in archivos),
+            sum(e.stat().st_size for e in archivos),
+            [e.path for e in archivos]
+        )
+        for archivos in grupos.values()
+    )
+    total = sum(tamano for _, tamano, _ in unidades)
+
+    eliminados = []
+    for mtime, tamano, rutas in unidades:
+        vencido = max_edad is not None and ahora - mtime > max_edad
+        excedido = max_bytes is not None and total > max_bytes
+        if not (vencido or excedido):
+            continue
+        for ruta in rutas:
+            try:
+                os.remove(ruta)
+                eliminados.append(ruta)
+            except FileNotFoundError:
+                pass
+        total -= tamano
+    return eliminados
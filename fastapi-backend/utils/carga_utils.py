@@ -0,0 +1,163 @@
+import asyncio
+import csv
+import hashlib
+import io
+import os
+import re
+import tempfile
+import zipfile
+from typing import List, Optional, Tuple
+
+from openpyxl import load_workbook
+
+# Límites de cada archivo subido (0 en la variable de entorno desactiva el límite).
+MAX_BYTES_CARGA = int(os.environ.get("KMEANS_MAX_BYTES_CARGA", str(200 * 1024 ** 2))) or None
+MAX_FILAS_CARGA = int(os.environ.get("KMEANS_MAX_FILAS_CARGA", "2000000")) or None
+TAMANO_BLOQUE_CARGA = 1 << 20
+# Apertura de un elemento <row> en el XML de la hoja (con o sin prefijo de espacio de nombres).
+PATRON_FILA_XLSX = re.compile(rb"<(?:\w+:)?row[\s>/]")
+EXTENSIONES_CARGA = (".csv", ".xlsx")
+
+
+class ErrorCarga(ValueError):
+    """Archivo rechazado antes de procesarlo; el endpoint lo devuelve con `estado` y `detalle`."""
+
+    def __init__(self, estado: int, detalle: str):
+        super().__init__(detalle)
+        self.estado = estado
+        self.detalle = detalle
+
+
+def _decodificar(linea: bytes) -> str:
+    try:
+        return linea.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return linea.decode("latin-1")
+
+
+def encabezado_csv(primera_linea: bytes) -> List[str]:
+    return next(csv.reader(io.StringIO(_decodificar(primera_linea))), [])
+
+
+def contar_filas_xml(archivo, max_filas: Optional[int] = None) -> int:
+    """Cuenta los elementos <row> del XML de una hoja por bloques, sin interpretar las celdas.
+
+    Se deja de contar al pasar `max_filas`.
+    """
+    filas, resto = 0, b""
+    while True:
+        bloque = archivo.read(TAMANO_BLOQUE_CARGA)
+        if not bloque:
+            return filas
+        texto = resto + bloque
+        # Una etiqueta sin cerrar al final del bloque se cuenta junto con el siguiente.
+        corte = texto.rfind(b"<")
+        if corte < 0 or b">" in texto[corte:]:
+            corte = len(texto)
+        filas += len(PATRON_FILA_XLSX.findall(texto, 0, corte))
+        resto = texto[corte:]
+        if max_filas and filas > max_filas:
+            return filas
+
+
+def inspeccionar_xlsx(ruta: str, max_filas: Optional[int] = None) -> Tuple[List[str], int]:
+    """Encabezado y cota de filas de datos de un XLSX (modo read_only).
+
+    La cota sale de la etiqueta <dimension> de la hoja. Los libros que no la escriben
+    (p. ej. openpyxl en modo write_only) no la tienen; en ese caso se cuentan las filas
+    del XML de la hoja (ver contar_filas_xml).
+    """
+    try:
+        libro = load_workbook(ruta, read_only=True)
+    except Exception:
+        raise ErrorCarga(400, "El archivo no es un XLSX válido")
+    try:
+        hoja = libro.active
+        primera = next(hoja.iter_rows(max_row=1, values_only=True), ())
+        encabezado = [str(valor) for valor in primera if valor is not None]
+        if hoja.max_row is not None:
+            return encabezado, max(hoja.max_row - 1, 0)
+        with zipfile.ZipFile(ruta) as libro_zip, libro_zip.open(hoja._worksheet_path) as hoja_xml:
+            filas = contar_filas_xml(hoja_xml, max_filas + 1 if max_filas else None)
+        return encabezado, max(filas - 1, 0)
+    finally:
+        libro.close()
+
+
+class Carga:
+    """Copia en streaming de un archivo subido hacia un temporal único del directorio de datos.
+
+    Los bloques se leen con `await archivo.read()` y se escriben en un hilo, así el event
+    loop sigue atendiendo otras solicitudes. Mientras se copia se calcula el SHA-256, se
+    corta al superar `max_bytes` y, en CSV, se leen el encabezado y una cota de filas
+    (saltos de línea) directamente del flujo. Al terminar el temporal se renombra a
+    `<nombre>_<sha256[:12]><ext>`: dos subidas con el mismo nombre y distinto
+    contenido nunca comparten archivo, y las idénticas lo reutilizan.
+
+    En los endpoints, `archivo` es un UploadFile que Starlette ya recibió completo en su
+    propio temporal: la copia es por bloques desde ese temporal, no desde la red. El
+    límite de bytes durante la recepción lo aplica main.LimiteCarga, con margen para los
+    demás campos del formulario; `max_bytes` vuelve a comprobar el tamaño del archivo.
+    """
+
+    def __init__(self, directorio: str, max_bytes: Optional[int] = MAX_BYTES_CARGA,
+                 max_filas: Optional[int] = MAX_FILAS_CARGA, validar_encabezado=None):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.max_filas = max_filas
+        # Recibe la lista de encabezados y lanza una excepción si el archivo no sirve.
+        self.validar_encabezado = validar_encabezado
+
+    def _revisar_filas(self, filas: int):
+        if self.max_filas and filas > self.max_filas:
+            raise ErrorCarga(413, f"El archivo supera el límite de {self.max_filas} filas")
+
+    async def guardar(self, archivo, nombre: str) -> Tuple[str, str]:
+        """Guarda el archivo y devuelve su ruta definitiva y el hash SHA-256 del contenido."""
+        base, extension = os.path.splitext(os.path.basename(nombre))
+        extension = extension.lower()
+        if extension not in EXTENSIONES_CARGA:
+            raise ErrorCarga(400, "Formato de archivo no válido")
+
+        os.makedirs(self.directorio, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, prefix=".carga_", suffix=extension)
+        hash_archivo = hashlib.sha256()
+        total, saltos, primera_linea = 0, 0, b""
+        try:
+            with os.fdopen(descriptor, "wb") as destino:
+                while True:
+                    bloque = await archivo.read(TAMANO_BLOQUE_CARGA)
+                    if not bloque:
+                        break
+                    total += len(bloque)
+                    if self.max_bytes and total > self.max_bytes:
+                        raise ErrorCarga(413, f"El archivo supera el límite de {self.max_bytes} bytes")
+                    if extension == ".csv":
+                        if saltos == 0:
+                            primera_linea += bloque.split(b"\n", 1)[0]
+                        saltos += bloque.count(b"\n")
+                        if saltos and primera_linea is not None:
+                            if self.validar_encabezado:
+                                self.validar_encabezado(encabezado_csv(primera_linea))
+                            primera_linea = None
+                        self._revisar_filas(saltos - 1)
+                    hash_archivo.update(bloque)
+                    await asyncio.to_thread(destino.write, bloque)
+
+            if extension == ".csv" and primera_linea is not None and self.validar_encabezado:
+                # CSV de una sola línea sin salto final.
+                self.validar_encabezado(encabezado_csv(primera_linea))
+            if extension == ".xlsx":
+                encabezado, filas = await asyncio.to_thread(inspeccionar_xlsx, temporal, self.max_filas)
+                self._revisar_filas(filas)
+                if self.validar_encabezado:
+                    self.validar_encabezado(encabezado)
+
+            digest = hash_archivo.hexdigest()
+            ruta = os.path.join(self.directorio, f"{base}_{digest[:12]}{extension}")
+            os.replace(temporal, ruta)
+            return ruta, digest
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
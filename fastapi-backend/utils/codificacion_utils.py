@@ -0,0 +1,76 @@
+import unicodedata
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.conjunto_utils import ConjuntoEncuesta
+
+
+def limpiar_texto(texto):
+    texto = str(texto).strip().lower()
+    texto = texto.replace("¿", "").replace("?", "").replace("¡", "").replace("!", "")
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("utf-8")
+    return texto
+
+
+def _aplicar_por_valor_unico(serie: pd.Series, funcion) -> pd.Series:
+    """Aplica `funcion` una sola vez por valor distinto y reconstruye la columna con los códigos.
+
+    Las respuestas de la encuesta tienen muy pocos valores distintos por columna, así que
+    factorizar y evaluar solo los únicos da exactamente el mismo resultado que `Series.map`
+    con una fracción del costo.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    valores = pd.Series(unicos, dtype=object).map(funcion)
+    return pd.Series(valores.to_numpy()[codigos], index=serie.index, name=serie.name)
+
+
+def _normalizar_celda(valor):
+    return valor.strip().lower() if isinstance(valor, str) else valor
+
+
+def limpiar_valores(df: pd.DataFrame) -> pd.DataFrame:
+    """Equivalente vectorizado de los dos `applymap` (strip y lower) sobre celdas de texto."""
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        df[col] = _aplicar_por_valor_unico(df[col], _normalizar_celda)
+    return df
+
+
+class CodificadorEncuesta:
+    """Codificador del cuestionario construido una sola vez a partir del registro `Cuestionario`.
+
+    Usa el texto ya normalizado de cada pregunta (-> "pN") y de cada opción de
+    respuesta (-> puntaje) para no repetir `limpiar_texto` sobre datos estáticos.
+    """
+
+    def __init__(self, cuestionario):
+        self.cuestionario = cuestionario
+
+    def nombres_normalizados(self, encabezado) -> List[str]:
+        """Encabezados normalizados, con la clave "pN" en lugar del texto de cada pregunta."""
+        return [self.cuestionario.mapa_columnas.get(limpiar_texto(col), limpiar_texto(col)) for col in encabezado]
+
+    def codificar_matriz(self, df: pd.DataFrame) -> Tuple[np.ndarray, List[str]]:
+        """Codifica directo a una matriz int8 (orden Fortran) sin pasar por un DataFrame intermedio.
+
+        Cada columna se factoriza y sus valores distintos se traducen con una tabla int8;
+        0 marca la respuesta no reconocida (las opciones puntúan de 1 a 5).
+        """
+        nombres = self.nombres_normalizados(df.columns)
+        columnas = self.columnas_codificadas(nombres)
+        matriz = np.zeros((len(df), len(columnas)), dtype=np.int8, order="F")
+        for j, clave in enumerate(columnas):
+            opciones = self.cuestionario.opciones_normalizadas[clave]
+            codigos, unicos = pd.factorize(df.iloc[:, nombres.index(clave)], use_na_sentinel=False)
+            tabla = np.array([opciones.get(limpiar_texto(valor), 0) for valor in unicos], dtype=np.int8)
+            matriz[:, j] = tabla[codigos]
+        return matriz, columnas
+
+    def codificar_conjunto(self, df: pd.DataFrame) -> ConjuntoEncuesta:
+        matriz, columnas = self.codificar_matriz(df)
+        return ConjuntoEncuesta(respuestas=matriz, columnas=columnas)
+
+    def columnas_codificadas(self, columnas) -> list:
+        return [col for col in self.cuestionario.claves if col in columnas]
@@ -0,0 +1,101 @@
+from dataclasses import dataclass, field, replace
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class ConjuntoEncuesta:
+    """Set de encuesta tipado que recorren codificación, puntuación, clustering y exportación.
+
+    - `respuestas`: matriz int8 (filas x preguntas, orden Fortran); 0 = sin respuesta válida,
+      así la máscara de nulos es `respuestas == 0` y no se guarda aparte.
+    - `puntajes`: int16 con una columna por categoría más "Puntaje Total".
+    - `personalidad` / `prediccion`: códigos int8 sobre `etiquetas`.
+    - `clusters`: uint8 (uint16 si hay más de 256 clusters).
+
+    Cada etapa completa sus arreglos en lugar de convertir columnas de un DataFrame;
+    el DataFrame se arma una sola vez, al exportar (ver `como_dataframe`).
+    """
+
+    respuestas: np.ndarray
+    columnas: List[str]
+    columnas_puntaje: List[str] = field(default_factory=list)
+    puntajes: Optional[np.ndarray] = None
+    etiquetas: Tuple[str, ...] = ()
+    personalidad: Optional[np.ndarray] = None
+    clusters: Optional[np.ndarray] = None
+    prediccion: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self.respuestas.shape[0]
+
+    @property
+    def faltantes(self) -> np.ndarray:
+        return self.respuestas == 0
+
+    def seleccionar(self, columnas: Sequence[str]) -> "ConjuntoEncuesta":
+        """Subconjunto de preguntas (sin copiar si son todas y en el mismo orden)."""
+        columnas = list(columnas)
+        if columnas == self.columnas:
+            return self
+        indices = [self.columnas.index(col) for col in columnas]
+        return replace(self, respuestas=np.asfortranarray(self.respuestas[:, indices]), columnas=columnas)
+
+    def filtrar(self, mascara: np.ndarray) -> "ConjuntoEncuesta":
+        """Filas donde `mascara` es verdadera (sin copiar si son todas)."""
+        if mascara.all():
+            return self
+
+        def _filas(arreglo):
+            return None if arreglo is None else arreglo[mascara]
+
+        return replace(
+            self,
+            respuestas=np.asfortranarray(self.respuestas[mascara]),
+            puntajes=_filas(self.puntajes),
+            personalidad=_filas(self.personalidad),
+            clusters=_filas(self.clusters),
+            prediccion=_filas(self.prediccion)
+        )
+
+    @property
+    def columnas_caracteristicas(self) -> List[str]:
+        return self.columnas + [col for col in self.columnas_puntaje if col != "Puntaje Total"]
+
+    def caracteristicas(self, filas: slice = slice(None)) -> pd.DataFrame:
+        """Entradas de KMeans: respuestas y puntajes por categoría (sin el total), en float64.
+
+        Es la única conversión del set; scikit-learn trabaja en float64 de todos modos.
+        Con `filas` se convierte solo ese tramo (el entrenamiento incremental recorre
+        el set por lotes sin tener nunca la matriz float64 completa).
+        """
+        categorias = self.columnas_caracteristicas[len(self.columnas):]
+        respuestas = self.respuestas[filas]
+        X = np.empty((respuestas.shape[0], len(self.columnas) + len(categorias)), dtype=np.float64, order="F")
+        X[:, :len(self.columnas)] = respuestas
+        if categorias:
+            X[:, len(self.columnas):] = self.puntajes[filas][:, [self.columnas_puntaje.index(c) for c in categorias]]
+        return pd.DataFrame(X, columns=self.columnas + categorias, copy=False)
+
+    def _categorica(self, codigos: np.ndarray) -> pd.Categorical:
+        return pd.Categorical.from_codes(codigos, categories=self.etiquetas, ordered=True)
+
+    def como_dataframe(self) -> pd.DataFrame:
+        """Columnas con los tipos compactos del conjunto; las respuestas con nulos se exponen como Int8."""
+        faltantes = self.faltantes
+        columnas = {}
+        for j, col in enumerate(self.columnas):
+            columna = self.respuestas[:, j]
+            columnas[col] = pd.arrays.IntegerArray(columna, faltantes[:, j]) if faltantes[:, j].any() else columna
+        for j, col in enumerate(self.columnas_puntaje):
+            columnas[col] = self.puntajes[:, j]
+        if self.personalidad is not None:
+            columnas["Personalidad"] = self._categorica(self.personalidad)
+            columnas["Clasificacion"] = self._categorica(self.personalidad)
+        if self.clusters is not None:
+            columnas["Cluster"] = self.clusters
+        if self.prediccion is not None:
+            columnas["Prediccion_Personalidad"] = self._categorica(self.prediccion)
+        return pd.DataFrame(columnas, copy=False)
@@ -0,0 +1,101 @@
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial.distance import cdist, pdist
+
+from mapeos.cuestionario import CUESTIONARIO
+from utils.puntuacion_utils import etiquetas_por_cluster
+
+
+def _etiquetas(centros: np.ndarray, columnas: Sequence[str]) -> List[str]:
+    indices_p = [i for i, col in enumerate(columnas) if col in CUESTIONARIO.opciones_normalizadas]
+    etiquetas = etiquetas_por_cluster(centros, indices_p)
+    return [etiquetas[cluster] for cluster in range(len(centros))]
+
+
+def _escala(centros: np.ndarray) -> float:
+    """Menor distancia entre centros de referencia (o la norma del centro si solo hay uno)."""
+    if len(centros) > 1:
+        escala = pdist(centros).min()
+    else:
+        escala = np.linalg.norm(centros)
+    return float(escala) if escala > 0 else 1.0
+
+
+def comparar_centros(referencia: np.ndarray, nuevos: np.ndarray, columnas: Sequence[str],
+                     tamanos_referencia: Optional[Sequence[int]] = None) -> Dict:
+    """Alinea los centros con el algoritmo húngaro y mide cuánto se movieron.
+
+    - `desplazamiento_relativo`: el mayor desplazamiento entre parejas dividido por la
+      menor distancia entre centros de referencia; por debajo de ~0.5 ningún centro
+      se acercó a otro cluster más que al suyo.
+    - `estabilidad_etiquetas`: fracción de filas de referencia (por tamaño de cluster)
+      cuyo cluster conserva la etiqueta de personalidad en su pareja.
+    - `estabilidad_clusters`: fracción cuyo centro de referencia tiene como centro nuevo
+      más cercano a su pareja, es decir, que no cambiarían de cluster.
+    Los clusters sin pareja (distinto número de clusters) cuentan como inestables.
+    """
+    distancias = cdist(referencia, nuevos)
+    filas, parejas = linear_sum_assignment(distancias)
+    desplazamientos = distancias[filas, parejas]
+
+    etiquetas_ref = _etiquetas(referencia, columnas)
+    etiquetas_nuevas = _etiquetas(nuevos, columnas)
+    pesos = np.asarray(tamanos_referencia if tamanos_referencia is not None else np.ones(len(referencia)),
+                       dtype=np.float64)
+    pesos = pesos / pesos.sum() if pesos.sum() > 0 else np.full(len(referencia), 1 / len(referencia))
+
+    cercanos = distancias.argmin(axis=1)
+    conserva_etiqueta = np.array([etiquetas_ref[i] == etiquetas_nuevas[j] for i, j in zip(filas, parejas)])
+    sin_pareja = len(referencia) != len(nuevos)
+
+    return {
+        "asignacion": [
+            {
+                "cluster_referencia": int(i),
+                "cluster_nuevo": int(j),
+                "desplazamiento": float(d),
+                "etiqueta_referencia": etiquetas_ref[i],
+                "etiqueta_nueva": etiquetas_nuevas[j]
+            }
+            for i, j, d in zip(filas, parejas, desplazamientos)
+        ],
+        "clusters_sin_pareja": {
+            "referencia": sorted(set(range(len(referencia))) - set(filas.tolist())),
+            "nuevo": sorted(set(range(len(nuevos))) - set(parejas.tolist()))
+        },
+        "desplazamiento_maximo": float(desplazamientos.max()) if len(desplazamientos) else None,
+        "desplazamiento_medio": float(desplazamientos.mean()) if len(desplazamientos) else None,
+        "desplazamiento_relativo": None if sin_pareja else float(desplazamientos.max() / _escala(referencia)),
+        "estabilidad_etiquetas": float(pesos[filas[conserva_etiqueta]].sum()),
+        "estabilidad_clusters": float(pesos[filas[cercanos[filas] == parejas]].sum()),
+        "clusters_reordenados": bool(np.any(filas != parejas))
+    }
+
+
+def comparar_modelos(registro, referencia: str, nuevo: str) -> Dict:
+    """Compara dos modelos guardados con los centros en caché del registro (sin cargar datos ni pickles).
+
+    Lanza FileNotFoundError si alguno no existe y ValueError si no usan las mismas columnas.
+    """
+    manifiesto_referencia = registro.obtener(referencia)
+    manifiesto_nuevo = registro.obtener(nuevo)
+    if manifiesto_referencia.get("columnas") != manifiesto_nuevo.get("columnas"):
+        raise ValueError("Los modelos no usan las mismas columnas.")
+    comparacion = comparar_centros(
+        registro.centros(referencia),
+        registro.centros(nuevo),
+        manifiesto_referencia.get("columnas") or [],
+        manifiesto_referencia.get("tamanos_clusters")
+    )
+    return {"referencia": os.path.basename(referencia), "nuevo": os.path.basename(nuevo), **comparacion}
+
+
+def reasignar_etiquetas(comparacion: Dict, n_clusters: int) -> np.ndarray:
+    """Tabla cluster nuevo -> cluster de referencia según la asignación húngara."""
+    tabla = np.arange(n_clusters)
+    for pareja in comparacion["asignacion"]:
+        tabla[pareja["cluster_nuevo"]] = pareja["cluster_referencia"]
+    return tabla
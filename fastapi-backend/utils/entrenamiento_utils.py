@@ -0,0 +1,184 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, kmeans_plusplus
+from threadpoolctl import threadpool_limits
+
+ALGORITMOS = ("lloyd", "elkan")
+INICIALIZACIONES = ("k-means++", "random")
+
+# Procesos para los reinicios cuando la configuración no los indica; ColaTrabajos lo
+# fija en sus trabajadores (ver trabajos_utils) para no pasar de un proceso por núcleo.
+procesos_por_defecto: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class ConfiguracionKMeans:
+    """Parámetros del entrenamiento completo; los valores por defecto equivalen a
+    `KMeans(algorithm="elkan", random_state=42)`.
+
+    `n_init=None` usa el criterio "auto" de scikit-learn (1 reinicio con k-means++,
+    10 con random). Con `agrupar_duplicados` se entrena sobre los vectores de
+    respuesta únicos ponderados por su frecuencia (ver entrenar_kmeans), lo que exige
+    Elkan: calcula distancias exactas, mientras que Lloyd las obtiene con productos
+    matriciales sobre los datos centrados y, con respuestas enteras, los empates de
+    distancia se resuelven distinto según qué filas reciba. Por eso Elkan es también
+    el algoritmo por defecto sin agrupar: activar `agrupar_duplicados` no cambia el modelo.
+    """
+
+    algoritmo: Optional[str] = None  # None: "elkan"
+    inicializacion: str = "k-means++"
+    n_init: Optional[int] = None
+    max_iter: int = 300
+    tol: float = 1e-4
+    agrupar_duplicados: bool = False
+    n_procesos: Optional[int] = None  # None: un proceso por núcleo (o procesos_por_defecto)
+    random_state: int = 42
+
+    def validar(self):
+        errores = []
+        if self.algoritmo is not None and self.algoritmo not in ALGORITMOS:
+            errores.append(f"algoritmo no válido. Opciones: {', '.join(ALGORITMOS)}")
+        if self.agrupar_duplicados and self.algoritmo == "lloyd":
+            errores.append("agrupar_duplicados requiere el algoritmo elkan")
+        if self.inicializacion not in INICIALIZACIONES:
+            errores.append(f"inicializacion no válida. Opciones: {', '.join(INICIALIZACIONES)}")
+        if self.n_init is not None and self.n_init < 1:
+            errores.append("n_init debe ser mayor o igual a 1")
+        if self.max_iter < 1:
+            errores.append("max_iter debe ser mayor o igual a 1")
+        if self.tol < 0:
+            errores.append("tol no puede ser negativa")
+        return errores
+
+    @property
+    def algoritmo_efectivo(self) -> str:
+        return self.algoritmo or "elkan"
+
+    @property
+    def reinicios(self) -> int:
+        if self.n_init is not None:
+            return self.n_init
+        return 1 if self.inicializacion == "k-means++" else 10
+
+
+def agrupar_filas(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectores únicos, su frecuencia (peso) y el índice de cada fila original en los únicos.
+
+    Las respuestas son ordinales de pocas opciones, así que miles de encuestados
+    suelen compartir el mismo vector; cada fila se compara como un bloque de bytes.
+    """
+    X = np.ascontiguousarray(X)
+    enteros = np.all(X == np.round(X)) and np.abs(X).max(initial=0) < 2 ** 15
+    compacta = np.ascontiguousarray(X.astype(np.int16 if enteros else np.float64))
+    filas = compacta.view(np.dtype((np.void, compacta.dtype.itemsize * compacta.shape[1]))).ravel()
+    _, primeras, inversa, conteos = np.unique(filas, return_index=True, return_inverse=True, return_counts=True)
+    return X[primeras], conteos.astype(np.float64), inversa.ravel()
+
+
+def centros_iniciales(X: np.ndarray, n_clusters: int, inicializacion: str, reinicios: int,
+                      semilla: int) -> List[np.ndarray]:
+    """Centros iniciales de cada reinicio, calculados sobre los datos completos (no sobre los únicos).
+
+    Son los mismos que elige `KMeans(init=inicializacion, n_init=reinicios, random_state=semilla)`:
+    scikit-learn centra los datos, usa un único RandomState para todos los reinicios y,
+    con "random", sortea las filas con probabilidades uniformes. Así el entrenamiento
+    agrupado parte de los mismos centros que el entrenamiento sobre todas las filas.
+    """
+    rng = np.random.RandomState(semilla)
+    centrados = X - X.mean(axis=0)
+    inicios = []
+    for _ in range(reinicios):
+        if inicializacion == "k-means++":
+            _, indices = kmeans_plusplus(centrados, n_clusters, random_state=rng)
+        else:
+            indices = rng.choice(len(X), size=n_clusters, replace=False, p=np.full(len(X), 1 / len(X)))
+        inicios.append(X[indices])
+    return inicios
+
+
+# Datos compartidos por cada proceso del pool (se envían una vez por proceso, no por reinicio).
+_datos_proceso: Optional[tuple] = None
+
+
+def _iniciar_proceso(X: np.ndarray, pesos: np.ndarray):
+    global _datos_proceso
+    _datos_proceso = (X, pesos)
+
+
+def _ajustar(centros: np.ndarray, n_clusters: int, configuracion: ConfiguracionKMeans,
+             columnas: list, tol: float, un_hilo: bool = True) -> KMeans:
+    X, pesos = _datos_proceso
+    modelo = KMeans(n_clusters=n_clusters, init=centros, n_init=1, algorithm=configuracion.algoritmo_efectivo,
+                    max_iter=configuracion.max_iter, tol=tol, random_state=configuracion.random_state)
+    # Un hilo por proceso cuando los reinicios corren en paralelo en el pool.
+    with threadpool_limits(1 if un_hilo else None):
+        modelo.fit(pd.DataFrame(X, columns=columnas), sample_weight=pesos)
+    return modelo
+
+
+def _entrenar_en_proceso(X: pd.DataFrame, n_clusters: int,
+                         configuracion: ConfiguracionKMeans) -> Tuple[KMeans, np.ndarray]:
+    # Sobre todas las filas los reinicios quedan en este proceso con el n_init de
+    # scikit-learn: repartirlos copiaría la matriz completa a cada proceso del pool.
+    modelo = KMeans(n_clusters=n_clusters, init=configuracion.inicializacion, n_init=configuracion.reinicios,
+                    algorithm=configuracion.algoritmo_efectivo, max_iter=configuracion.max_iter,
+                    tol=configuracion.tol, random_state=configuracion.random_state)
+    return modelo, modelo.fit_predict(X)
+
+
+def entrenar_kmeans(X: pd.DataFrame, n_clusters: int,
+                    configuracion: ConfiguracionKMeans = ConfiguracionKMeans()) -> Tuple[KMeans, np.ndarray]:
+    """Entrena KMeans y devuelve el modelo y la etiqueta de cada fila de `X`.
+
+    Con la configuración por defecto es `KMeans(n_clusters, algorithm="elkan", random_state=42).fit_predict(X)`.
+    Con `agrupar_duplicados`, cada reinicio parte de los mismos centros que elegiría ese
+    KMeans sobre los datos completos (ver centros_iniciales) y las iteraciones corren sobre
+    los vectores únicos con `sample_weight`; centros, inercia y etiquetas coinciden con la
+    misma configuración sin agrupar. Como la matriz de únicos es pequeña, sus reinicios se
+    reparten entre procesos.
+    """
+    if not configuracion.agrupar_duplicados:
+        return _entrenar_en_proceso(X, n_clusters, configuracion)
+    datos = X.to_numpy(dtype=np.float64)
+    unicos, pesos, inversa = agrupar_filas(datos)
+    if len(unicos) < n_clusters:
+        # Menos vectores distintos que clusters: se entrena sobre todas las filas.
+        return _entrenar_en_proceso(X, n_clusters, configuracion)
+
+    inicios = centros_iniciales(datos, n_clusters, configuracion.inicializacion, configuracion.reinicios,
+                                configuracion.random_state)
+    columnas = list(X.columns)
+
+    # scikit-learn escala `tol` por la varianza media de las filas recibidas (sin pesos);
+    # se corrige para que el criterio de convergencia sea el de los datos completos.
+    tol = configuracion.tol
+    varianza_unicos = np.var(unicos, axis=0).mean()
+    if tol and varianza_unicos > 0:
+        tol = tol * np.var(datos, axis=0).mean() / varianza_unicos
+
+    n_procesos = min(configuracion.n_procesos or procesos_por_defecto or os.cpu_count() or 1, len(inicios))
+    if n_procesos > 1:
+        # spawn: el trabajador que llama ya pudo iniciar hilos de OpenMP y fork no es seguro.
+        with ProcessPoolExecutor(max_workers=n_procesos, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_iniciar_proceso, initargs=(unicos, pesos)) as pool:
+            modelos = list(pool.map(_ajustar, inicios, [n_clusters] * len(inicios), [configuracion] * len(inicios),
+                                    [columnas] * len(inicios), [tol] * len(inicios)))
+    else:
+        _iniciar_proceso(unicos, pesos)
+        try:
+            modelos = [_ajustar(c, n_clusters, configuracion, columnas, tol, un_hilo=False) for c in inicios]
+        finally:
+            _iniciar_proceso(None, None)
+
+    # Mismo criterio que scikit-learn entre reinicios: la menor inercia (el primero si empatan).
+    modelo = min(modelos, key=lambda m: m.inertia_)
+    etiquetas = modelo.labels_[inversa].astype(np.int32)
+    modelo.labels_ = etiquetas
+    modelo.set_params(init=configuracion.inicializacion, n_init=configuracion.reinicios)
+    return modelo, etiquetas
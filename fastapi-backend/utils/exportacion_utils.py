@@ -0,0 +1,94 @@
+import os
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Prefijo del archivo solicitado -> (prefijo del artefacto canónico, extensión del derivado).
+# numerico_ y prediccion_ siempre fueron el mismo Excel, así que comparten derivado.
+DERIVADOS = {
+    "numerico_": ("resultado_", ".xlsx"),
+    "prediccion_": ("resultado_", ".xlsx"),
+    "clusterizado_": ("resultado_", ".csv"),
+    "limpio_": ("limpio_", ".xlsx"),
+}
+
+
+FILAS_POR_GRUPO = 50_000
+
+
+def exportar_columnar(df: pd.DataFrame, ruta: str) -> str:
+    """Escribe el artefacto canónico en Parquet de forma atómica.
+
+    Los grupos de filas acotados permiten paginar leyendo solo los grupos necesarios.
+    """
+    # Temporal propio de cada escritura: dos trabajos sobre el mismo archivo no se pisan.
+    temporal = f"{ruta}.{uuid.uuid4().hex[:8]}.tmp"
+    df.to_parquet(temporal, index=False, row_group_size=FILAS_POR_GRUPO)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def leer_filas(ruta: str, desde: int, limite: int, columnas: Optional[List[str]] = None) -> Dict:
+    """Página de filas de un Parquet en formato columnar ({columna: [valores]})."""
+    archivo = pq.ParquetFile(ruta)
+    total = archivo.metadata.num_rows
+    hasta = min(desde + limite, total)
+
+    grupos, inicio_grupos, inicio = [], None, 0
+    for i in range(archivo.num_row_groups):
+        filas_grupo = archivo.metadata.row_group(i).num_rows
+        if inicio + filas_grupo > desde and inicio < hasta:
+            grupos.append(i)
+            inicio_grupos = inicio if inicio_grupos is None else inicio_grupos
+        inicio += filas_grupo
+
+    nombres = columnas or archivo.schema_arrow.names
+    faltantes = [col for col in nombres if col not in archivo.schema_arrow.names]
+    if faltantes:
+        raise KeyError(", ".join(faltantes))
+    if grupos:
+        tabla = archivo.read_row_groups(grupos, columns=nombres).slice(desde - inicio_grupos, hasta - desde)
+        datos = tabla.to_pydict()
+    else:
+        datos = {col: [] for col in nombres}
+
+    return {"total": total, "desde": desde, "limite": limite, "columnas": list(nombres), "datos": datos}
+
+
+def resolver_derivado(directorio: str, nombre_archivo: str) -> Optional[Tuple[str, str]]:
+    """Para un nombre como `clusterizado_x.csv` devuelve (parquet canónico, ruta del derivado)."""
+    for prefijo, (prefijo_canonico, extension) in DERIVADOS.items():
+        if nombre_archivo.startswith(prefijo) and nombre_archivo.endswith(extension):
+            base = nombre_archivo[len(prefijo):-len(extension)]
+            canonico = os.path.join(directorio, f"{prefijo_canonico}{base}.parquet")
+            derivado = os.path.join(directorio, f"{prefijo_canonico}{base}{extension}")
+            return canonico, derivado
+    return None
+
+
+def materializar(directorio: str, nombre_archivo: str) -> Optional[str]:
+    """Ruta lista para descargar: el archivo tal cual, o su derivado generado (y guardado) a partir del Parquet."""
+    ruta = os.path.join(directorio, nombre_archivo)
+    if os.path.exists(ruta):
+        return ruta
+
+    rutas = resolver_derivado(directorio, nombre_archivo)
+    if rutas is None:
+        return None
+    canonico, derivado = rutas
+    if os.path.exists(derivado):
+        return derivado
+    if not os.path.exists(canonico):
+        return None
+
+    df = pd.read_parquet(canonico)
+    raiz, extension = os.path.splitext(derivado)
+    temporal = f"{raiz}.{uuid.uuid4().hex[:8]}.tmp{extension}"
+    if derivado.endswith(".csv"):
+        df.to_csv(temporal, index=False, encoding='utf-8-sig')
+    else:
+        df.to_excel(temporal, index=False, engine="openpyxl")
+    os.replace(temporal, derivado)
+    return derivado
@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from typing import Iterator, List
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from utils.conjunto_utils import ConjuntoEncuesta
+
+TAMANO_LOTE = 50_000
+
+
+def leer_por_lotes(ruta: str, tamano_lote: int = TAMANO_LOTE) -> Iterator[pd.DataFrame]:
+    """Lee un CSV o XLSX en bloques de filas sin cargar el archivo completo en memoria."""
+    if ruta.endswith(".csv"):
+        yield from pd.read_csv(ruta, chunksize=tamano_lote)
+        return
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        # Igual que read_excel: se ignoran columnas vacías al final y filas totalmente vacías.
+        ancho = max((i + 1 for i, valor in enumerate(encabezado) if valor is not None), default=0)
+        encabezado = encabezado[:ancho]
+        lote = []
+        for fila in filas:
+            fila = fila[:ancho]
+            if all(valor is None for valor in fila):
+                continue
+            lote.append(fila)
+            if len(lote) == tamano_lote:
+                yield pd.DataFrame.from_records(lote, columns=encabezado)
+                lote = []
+        if lote:
+            yield pd.DataFrame.from_records(lote, columns=encabezado)
+    finally:
+        libro.close()
+
+
+def estimar_filas(ruta: str) -> int:
+    """Cota aproximada del número de filas de datos, usada para reservar la matriz."""
+    if ruta.endswith(".csv"):
+        saltos = 0
+        with open(ruta, "rb") as archivo:
+            for bloque in iter(lambda: archivo.read(1 << 20), b""):
+                saltos += bloque.count(b"\n")
+        return max(saltos, 1)
+
+    libro = load_workbook(ruta, read_only=True)
+    try:
+        return max((libro.active.max_row or TAMANO_LOTE + 1) - 1, 1)
+    finally:
+        libro.close()
+
+
+@dataclass
+class ResultadoIngesta:
+    """Respuestas codificadas en una matriz int8 por columnas; 0 indica respuesta no reconocida."""
+
+    matriz: np.ndarray
+    columnas: List[str]
+    filas_leidas: int
+    filas_descartadas: int
+
+    def como_conjunto(self) -> ConjuntoEncuesta:
+        """Entrega la matriz al resto del pipeline sin copiarla."""
+        return ConjuntoEncuesta(respuestas=self.matriz, columnas=list(self.columnas))
+
+
+def ingerir_por_lotes(ruta: str, codificador, tamano_lote: int = TAMANO_LOTE) -> ResultadoIngesta:
+    """Lee, limpia y codifica el archivo bloque por bloque sobre una matriz int8 reservada.
+
+    Solo la matriz codificada crece con el tamaño del archivo; cada bloque de texto se
+    descarta en cuanto se codifica. Las filas con celdas vacías se descartan igual que
+    en el modo completo (`dropna`).
+    """
+    matriz = None
+    columnas = []
+    filas = 0
+    leidas = 0
+
+    for lote in leer_por_lotes(ruta, tamano_lote):
+        leidas += len(lote)
+        lote = lote.dropna()
+        codificado, columnas_lote = codificador.codificar_matriz(lote)
+
+        if matriz is None:
+            columnas = columnas_lote
+            matriz = np.zeros((estimar_filas(ruta), len(columnas)), dtype=np.int8, order="F")
+
+        if filas + len(codificado) > matriz.shape[0]:
+            nueva = np.zeros((max(2 * matriz.shape[0], filas + len(codificado)), len(columnas)), dtype=np.int8, order="F")
+            nueva[:filas] = matriz[:filas]
+            matriz = nueva
+
+        matriz[filas:filas + len(codificado)] = codificado[:, [columnas_lote.index(col) for col in columnas]]
+        filas += len(codificado)
+
+    if matriz is None:
+        matriz = np.zeros((0, 0), dtype=np.int8, order="F")
+
+    return ResultadoIngesta(
+        matriz=matriz[:filas],
+        columnas=columnas,
+        filas_leidas=leidas,
+        filas_descartadas=leidas - filas
+    )
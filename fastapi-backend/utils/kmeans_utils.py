@@ -1,41 +1,221 @@
+import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 import joblib
 import os
+import hashlib
 from datetime import datetime
+from typing import Tuple
+from utils.conjunto_utils import ConjuntoEncuesta
+from utils.entrenamiento_utils import ConfiguracionKMeans, entrenar_kmeans
+from utils.metricas_utils import MedidorEtapas
+from utils.deriva_utils import comparar_centros, reasignar_etiquetas
+from utils.modelos_utils import RegistroModelos, construir_manifiesto, escribir_manifiesto
 
-def guardar_modelo(modelo, nombre="kmeans_model"):
-    """Guarda el modelo en una carpeta llamada 'modelos' con marca de tiempo."""
-    fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
-    os.makedirs("modelos", exist_ok=True)
-    ruta = os.path.join("modelos", f"{nombre}_{fecha}.joblib")
-    joblib.dump(modelo, ruta)
+MODELOS_DIR = "modelos"
+MODOS_ENTRENAMIENTO = ("completo", "incremental")
+TAMANO_LOTE_ENTRENAMIENTO = 10_000
+
+# Manifiestos y centros de los modelos guardados, en caché por proceso.
+registro_modelos = RegistroModelos(MODELOS_DIR)
+
+def guardar_modelo(modelo, nombre="kmeans_model", filas: int = None, hash_datos: str = None, tamanos=None):
+    """Guarda el modelo en una carpeta llamada 'modelos' con marca de tiempo y su manifiesto JSON."""
+    ahora = datetime.now()
+    fecha = ahora.strftime("%Y%m%d_%H%M%S")
+    os.makedirs(MODELOS_DIR, exist_ok=True)
+    # Dos entrenamientos en el mismo segundo no deben pisarse (la deriva compara contra el anterior):
+    # el nombre se reserva al crear el archivo con "xb", que falla si otro proceso ya lo creó.
+    ruta = os.path.join(MODELOS_DIR, f"{nombre}_{fecha}.joblib")
+    sufijo = 1
+    while True:
+        try:
+            archivo = open(ruta, "xb")
+            break
+        except FileExistsError:
+            ruta = os.path.join(MODELOS_DIR, f"{nombre}_{fecha}_{sufijo}.joblib")
+            sufijo += 1
+    with archivo:
+        joblib.dump(modelo, archivo)
+    manifiesto = construir_manifiesto(modelo, filas, hash_datos, ahora.isoformat(timespec="seconds"), tamanos)
+    escribir_manifiesto(ruta, manifiesto)
     return ruta
 
-def aplicar_kmeans(df: pd.DataFrame, columnas_a_excluir: list = None, n_clusters: int = 3):
-    if columnas_a_excluir is None:
-        columnas_a_excluir = []
+def _iniciar_huella(columnas):
+    return hashlib.sha1(",".join(map(str, columnas)).encode("utf-8"))
 
-    # Filtrar columnas numéricas válidas
-    columnas_validas = df.select_dtypes(include=["number"]).columns
-    columnas_utiles = [col for col in columnas_validas if col not in columnas_a_excluir]
+def _actualizar_huella(h, X: pd.DataFrame):
+    # El hash de pandas es por fila: actualizar lote a lote da la misma huella que todo junto.
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
 
-    if not columnas_utiles:
-        raise ValueError("No hay columnas numéricas válidas para aplicar KMeans.")
+def hash_datos(X: pd.DataFrame) -> str:
+    """Huella de los datos de entrenamiento (valores y nombres de columnas)."""
+    h = _iniciar_huella(X.columns)
+    _actualizar_huella(h, X)
+    return h.hexdigest()
+
+def cargar_modelo(nombre_modelo: str):
+    """Carga un modelo guardado en 'modelos' por su nombre de archivo."""
+    ruta = os.path.join(MODELOS_DIR, os.path.basename(nombre_modelo))
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"Modelo no encontrado: {nombre_modelo}")
+    return joblib.load(ruta)
+
+def tamanos_base(modelo_base: str, base: KMeans) -> np.ndarray:
+    """Filas por cluster con las que se entrenó `modelo_base`.
+
+    Salen del manifiesto; si no las registra, de los conteos acumulados por partial_fit
+    (MiniBatchKMeans, cuyo `labels_` solo cubre el último lote) o de `labels_`.
+    """
+    try:
+        tamanos = registro_modelos.obtener(modelo_base).get("tamanos_clusters")
+    except (FileNotFoundError, ValueError):
+        tamanos = None
+    if tamanos is None:
+        if isinstance(base, MiniBatchKMeans):
+            tamanos = base._counts
+        else:
+            tamanos = np.bincount(base.labels_, minlength=base.n_clusters)
+    return np.asarray(tamanos, dtype=np.float64)
+
+def _lotes(conjunto: ConjuntoEncuesta, tamano_lote: int):
+    for inicio in range(0, len(conjunto), tamano_lote):
+        yield conjunto.caracteristicas(slice(inicio, inicio + tamano_lote))
+
+def entrenar_incremental(conjunto: ConjuntoEncuesta, n_clusters: int = 3, modelo_base: str = None,
+                         tamano_lote: int = TAMANO_LOTE_ENTRENAMIENTO) -> Tuple[MiniBatchKMeans, np.ndarray]:
+    """Entrena con MiniBatchKMeans.partial_fit recorriendo el conjunto por lotes.
+
+    Cada lote se convierte a float64 desde las respuestas int8 justo antes de usarlo,
+    así la memoria queda acotada por `tamano_lote` y no por el tamaño del set.
+
+    Si se indica `modelo_base`, se continúa desde ese modelo en lugar de reentrenar
+    todo el histórico. Un KMeans completo se usa como semilla de los centros y de los
+    conteos por cluster: sin conteos, el primer lote reemplazaría cada centro por la
+    media de sus filas nuevas. Devuelve también las filas por cluster del modelo base
+    (ceros si no hay), para que el manifiesto del modelo continuado cuente todo el histórico.
+    """
+    columnas = conjunto.columnas_caracteristicas
+    if modelo_base:
+        base = cargar_modelo(modelo_base)
+        if not isinstance(base, (KMeans, MiniBatchKMeans)):
+            raise ValueError("El modelo base no es un modelo KMeans")
+
+        columnas_base = list(getattr(base, "feature_names_in_", columnas))
+        if columnas_base != columnas:
+            raise ValueError("Las columnas seleccionadas no coinciden con las del modelo base.")
 
-    # ⚠️ Eliminar filas con NaN solo en columnas útiles para clustering
-    df_filtrado = df.dropna(subset=columnas_utiles)
+        tamanos_previos = tamanos_base(modelo_base, base)
+        if isinstance(base, MiniBatchKMeans):
+            modelo = base
+        else:
+            modelo = MiniBatchKMeans(n_clusters=base.n_clusters, init=base.cluster_centers_,
+                                     n_init=1, batch_size=tamano_lote, random_state=42)
+            # Cada centro entra como una fila con peso igual a su tamaño: queda en su lugar
+            # y los conteos de partial_fit arrancan con el histórico del modelo base.
+            modelo.partial_fit(pd.DataFrame(base.cluster_centers_, columns=columnas),
+                               sample_weight=tamanos_previos)
+    else:
+        modelo = MiniBatchKMeans(n_clusters=n_clusters, batch_size=tamano_lote, random_state=42)
+        tamanos_previos = np.zeros(n_clusters)
+
+    for lote in _lotes(conjunto, tamano_lote):
+        modelo.partial_fit(lote)
+    return modelo, tamanos_previos
+
+def etiquetar_por_lotes(modelo, conjunto: ConjuntoEncuesta,
+                        tamano_lote: int = TAMANO_LOTE_ENTRENAMIENTO) -> Tuple[np.ndarray, str]:
+    """Etiquetas y `hash_datos` del conjunto, convirtiendo a float64 un lote a la vez."""
+    etiquetas = np.empty(len(conjunto), dtype=np.int32)
+    huella = _iniciar_huella(conjunto.columnas_caracteristicas)
+    inicio = 0
+    for lote in _lotes(conjunto, tamano_lote):
+        etiquetas[inicio:inicio + len(lote)] = modelo.predict(lote)
+        _actualizar_huella(huella, lote)
+        inicio += len(lote)
+    return etiquetas, huella.hexdigest()
+
+def buscar_referencia(columnas: list, n_clusters: int):
+    """Modelo guardado más reciente con las mismas columnas y número de clusters (None si no hay)."""
+    for nombre in registro_modelos.listar(n_clusters=n_clusters):
+        try:
+            if registro_modelos.obtener(nombre)["columnas"] == columnas:
+                return nombre
+        except (FileNotFoundError, ValueError):
+            continue
+    return None
+
+def medir_deriva(modelo, columnas: list, referencia: str) -> dict:
+    """Compara el modelo recién entrenado con `referencia` usando los centros en caché del registro."""
+    manifiesto = registro_modelos.obtener(referencia)
+    if manifiesto["columnas"] != columnas:
+        raise ValueError("El modelo de referencia no usa las mismas columnas.")
+    comparacion = comparar_centros(
+        registro_modelos.centros(referencia), modelo.cluster_centers_, columnas, manifiesto.get("tamanos_clusters")
+    )
+    return {"referencia": os.path.basename(referencia), **comparacion}
+
+def aplicar_kmeans(conjunto: ConjuntoEncuesta, n_clusters: int = 3, modo: str = "completo",
+                   modelo_base: str = None, medidor: MedidorEtapas = None,
+                   configuracion: ConfiguracionKMeans = None, umbral_deriva: float = None,
+                   modelo_referencia: str = None):
+    """Entrena sobre `conjunto.caracteristicas()` y deja las etiquetas en `conjunto.clusters` (uint8).
+
+    El conjunto ya viene sin respuestas faltantes (ver MotorPuntuacion.puntuar).
+
+    Con `umbral_deriva` el modelo nuevo se compara con `modelo_referencia` (por defecto
+    el modelo base o el último guardado compatible) y, si su desplazamiento relativo
+    queda por debajo del umbral, no se guarda: se reutiliza la referencia y las
+    etiquetas se renumeran a sus clusters. Devuelve también la comparación (o None).
+    """
+    medidor = medidor or MedidorEtapas()
+    configuracion = configuracion or ConfiguracionKMeans()
+
+    columnas = conjunto.columnas_caracteristicas
+    if not columnas:
+        raise ValueError("No hay columnas numéricas válidas para aplicar KMeans.")
 
     # Aplicar KMeans
-    modelo = KMeans(n_clusters=n_clusters, random_state=42)
-    df_filtrado["Cluster"] = modelo.fit_predict(df_filtrado[columnas_utiles])
+    with medidor.etapa("entrenamiento", filas=len(conjunto)):
+        if modo == "incremental":
+            # Sin la matriz float64 completa: se entrena, etiqueta y calcula la huella por lotes.
+            X = None
+            modelo, tamanos_previos = entrenar_incremental(conjunto, n_clusters, modelo_base)
+            etiquetas, huella = etiquetar_por_lotes(modelo, conjunto)
+        else:
+            X = conjunto.caracteristicas()
+            modelo, etiquetas = entrenar_kmeans(X, n_clusters, configuracion)
+            tamanos_previos, huella = np.zeros(modelo.n_clusters), None
+
+    deriva = None
+    referencia = modelo_referencia or modelo_base
+    if umbral_deriva is not None and referencia is None:
+        referencia = buscar_referencia(columnas, modelo.n_clusters)
+    if referencia:
+        with medidor.etapa("deriva", filas=modelo.n_clusters):
+            try:
+                deriva = medir_deriva(modelo, columnas, referencia)
+            except ValueError as e:
+                deriva = {"referencia": os.path.basename(referencia), "error": str(e)}
 
-    # Guardar modelo entrenado
-    ruta_modelo = guardar_modelo(modelo)
-    print(f"✅ Modelo guardado en: {ruta_modelo}")
+    relativo = deriva.get("desplazamiento_relativo") if deriva else None
+    if umbral_deriva is not None and relativo is not None and relativo < umbral_deriva:
+        # Sin cambios relevantes: no se guarda otro modelo y los clusters siguen la numeración de la referencia.
+        etiquetas = reasignar_etiquetas(deriva, modelo.n_clusters)[etiquetas]
+        ruta_modelo = os.path.join(MODELOS_DIR, os.path.basename(referencia))
+        deriva["modelo_guardado"] = False
+    else:
+        # Guardar modelo entrenado
+        # Un modelo continuado registra también las filas del modelo base.
+        tamanos = np.bincount(etiquetas, minlength=modelo.n_clusters) + tamanos_previos
+        with medidor.etapa("guardado_modelo", filas=len(conjunto)):
+            ruta_modelo = guardar_modelo(modelo, filas=int(tamanos.sum()), hash_datos=huella or hash_datos(X),
+                                         tamanos=tamanos)
+        print(f"✅ Modelo guardado en: {ruta_modelo}")
+        if deriva is not None:
+            deriva["modelo_guardado"] = True
 
-    # Combinar resultados con DataFrame original
-    df.loc[df_filtrado.index, "Cluster"] = df_filtrado["Cluster"]
+    conjunto.clusters = etiquetas.astype(np.min_scalar_type(max(modelo.n_clusters - 1, 0)))
 
-    # ⬅️ ¡Retorna también la ruta del modelo!
-    return df, ruta_modelo
+    # ⬅️ ¡Retorna también la ruta del modelo y la deriva!
+    return conjunto, ruta_modelo, deriva
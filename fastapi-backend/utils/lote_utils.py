@@ -0,0 +1,189 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from mapeos.cuestionario import CUESTIONARIO
+from utils.codificacion_utils import CodificadorEncuesta
+from utils.ingesta_utils import TAMANO_LOTE, leer_por_lotes
+from utils.prediccion_utils import ModeloCargado, asignar_clusters, completar_categorias
+
+FORMATOS_SALIDA = ("csv", "parquet")
+LOTES_EN_VUELO_POR_PROCESO = 2
+
+codificador = CodificadorEncuesta(CUESTIONARIO)
+
+# Modelo y columnas a conservar de cada proceso del pool (se envían una vez por proceso, no por lote).
+_contexto_proceso: Optional[tuple] = None
+
+
+def _iniciar_proceso(modelo: ModeloCargado, conservar: Sequence[str]):
+    global _contexto_proceso
+    _contexto_proceso = (modelo, list(conservar))
+
+
+def clasificar_lote(lote: pd.DataFrame, modelo: ModeloCargado, conservar: Sequence[str]) -> pd.DataFrame:
+    """Codifica un bloque de encuestas y asigna el centro más cercano a cada fila.
+
+    Las filas conservan su posición: las que tienen alguna pregunta del modelo vacía o
+    no reconocida quedan sin Cluster (en el pipeline de entrenamiento se descartan).
+    """
+    if not modelo.columnas_p:
+        # Sin preguntas todas las filas caerían en el mismo centro con puntaje 0.
+        raise ValueError(f"El modelo {modelo.nombre} no usa ninguna pregunta del cuestionario")
+    respuestas, columnas = codificador.codificar_matriz(lote)
+    faltantes = [col for col in modelo.columnas_p if col not in columnas]
+    if faltantes:
+        raise ValueError(f"El archivo no tiene las preguntas del modelo: {', '.join(faltantes)}")
+
+    seleccion = respuestas[:, [columnas.index(col) for col in modelo.columnas_p]]
+    validas = (seleccion != 0).all(axis=1)
+
+    X = np.zeros((int(validas.sum()), len(modelo.columnas)), dtype=np.float64)
+    X[:, list(modelo.indices_p)] = seleccion[validas]
+    clusters = asignar_clusters(modelo, completar_categorias(modelo, X))
+
+    codigos_etiqueta = np.array(
+        [CUESTIONARIO.etiquetas_personalidad.index(modelo.etiquetas[c]) for c in range(len(modelo.centros))],
+        dtype=np.int8
+    )
+    cluster = np.zeros(len(lote), dtype=np.min_scalar_type(max(len(modelo.centros) - 1, 0)))
+    cluster[validas] = clusters
+
+    # Como texto: un bloque con la columna vacía no cambia el tipo respecto de los demás.
+    salida = {col: lote[col].astype("string") for col in conservar}
+    salida["Cluster"] = pd.arrays.IntegerArray(cluster, ~validas)
+    salida["Prediccion_Personalidad"] = pd.Categorical.from_codes(
+        np.where(validas, codigos_etiqueta[cluster], -1),
+        categories=CUESTIONARIO.etiquetas_personalidad, ordered=True
+    )
+    salida["Puntaje Total"] = pd.arrays.IntegerArray(seleccion.sum(axis=1, dtype=np.int16), ~validas)
+    return pd.DataFrame(salida).reset_index(drop=True)
+
+
+def _clasificar_en_proceso(lote: pd.DataFrame) -> pd.DataFrame:
+    modelo, conservar = _contexto_proceso
+    return clasificar_lote(lote, modelo, conservar)
+
+
+class EscritorPorBloques:
+    """Escribe el resultado bloque a bloque (CSV con encabezado una sola vez o Parquet por grupos de filas)."""
+
+    def __init__(self, ruta: str, formato: str):
+        self.ruta = ruta
+        self.formato = formato
+        self.temporal = f"{ruta}.tmp"
+        self._parquet = None
+        self._primero = True
+
+    def escribir(self, bloque: pd.DataFrame):
+        if self.formato == "parquet":
+            tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.temporal, tabla.schema)
+            self._parquet.write_table(tabla)
+        else:
+            bloque.to_csv(self.temporal, mode="w" if self._primero else "a", header=self._primero,
+                          index=False, encoding="utf-8-sig" if self._primero else "utf-8")
+        self._primero = False
+
+    def cerrar(self):
+        if self.formato == "parquet" and self._parquet is None:
+            # Archivo sin filas: Parquet necesita al menos el esquema.
+            self.escribir(pd.DataFrame())
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._primero:
+            open(self.temporal, "w").close()
+        os.replace(self.temporal, self.ruta)
+
+    def descartar(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if os.path.exists(self.temporal):
+            os.remove(self.temporal)
+
+
+def clasificar_archivo(ruta: str, modelo: ModeloCargado, ruta_salida: str, formato: str = "csv",
+                       conservar: Sequence[str] = (), tamano_lote: int = TAMANO_LOTE,
+                       pool: Optional[ProcessPoolExecutor] = None, n_procesos: int = 1) -> Dict:
+    """Lee `ruta` por bloques, los clasifica (en el pool si se indica) y escribe en orden.
+
+    Como máximo hay LOTES_EN_VUELO_POR_PROCESO bloques por proceso pendientes, así la
+    memoria no depende del tamaño del archivo. El resultado se escribe en un temporal y
+    se renombra al terminar.
+    """
+    escritor = EscritorPorBloques(ruta_salida, formato)
+    pendientes = deque()
+    filas = validas = 0
+
+    def _escribir_siguiente():
+        nonlocal filas, validas
+        resultado = pendientes.popleft()
+        resultado = resultado.result() if pool is not None else resultado
+        escritor.escribir(resultado)
+        filas += len(resultado)
+        validas += int(resultado["Cluster"].notna().sum())
+
+    try:
+        for lote in leer_por_lotes(ruta, tamano_lote):
+            lote.columns = [str(col).strip() for col in lote.columns]
+            columnas_faltantes = [col for col in conservar if col not in lote.columns]
+            if columnas_faltantes:
+                raise ValueError(f"Columnas a conservar no encontradas: {', '.join(columnas_faltantes)}")
+            if pool is not None:
+                pendientes.append(pool.submit(_clasificar_en_proceso, lote))
+                if len(pendientes) >= n_procesos * LOTES_EN_VUELO_POR_PROCESO:
+                    _escribir_siguiente()
+            else:
+                pendientes.append(clasificar_lote(lote, modelo, conservar))
+                _escribir_siguiente()
+        while pendientes:
+            _escribir_siguiente()
+        escritor.cerrar()
+    except BaseException:
+        for futuro in pendientes:
+            if pool is not None:
+                futuro.cancel()
+        escritor.descartar()
+        raise
+
+    return {"archivo": ruta, "salida": ruta_salida, "filas": filas, "clasificadas": validas,
+            "sin_clasificar": filas - validas}
+
+
+def clasificar_archivos(rutas: List[str], modelo: ModeloCargado, directorio_salida: str,
+                        formato: str = "csv", conservar: Sequence[str] = (),
+                        tamano_lote: int = TAMANO_LOTE, n_procesos: Optional[int] = None) -> List[Dict]:
+    """Clasifica cada archivo en `<directorio_salida>/<nombre>_clasificado.<formato>` (`<nombre>_2`, ... si se repite).
+
+    El pool se crea una vez para todos los archivos y cada proceso recibe el modelo al iniciar.
+    """
+    os.makedirs(directorio_salida, exist_ok=True)
+    n_procesos = n_procesos or os.cpu_count() or 1
+    pool = None
+    if n_procesos > 1:
+        pool = ProcessPoolExecutor(max_workers=n_procesos, initializer=_iniciar_proceso,
+                                   initargs=(modelo, list(conservar)))
+    try:
+        resumenes, usados = [], set()
+        for ruta in rutas:
+            nombre = base = os.path.splitext(os.path.basename(ruta))[0]
+            # encuestas.csv y encuestas.xlsx (o el mismo nombre en otra carpeta) no comparten salida.
+            sufijo = 2
+            while nombre in usados:
+                nombre = f"{base}_{sufijo}"
+                sufijo += 1
+            usados.add(nombre)
+            ruta_salida = os.path.join(directorio_salida, f"{nombre}_clasificado.{formato}")
+            resumenes.append(clasificar_archivo(ruta, modelo, ruta_salida, formato, conservar,
+                                                tamano_lote, pool, n_procesos))
+        return resumenes
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,196 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PERFILES_DIR = "perfiles"
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+# Pico del proceso anterior al último reinicio de VmHWM (ver reiniciar_rss_pico).
+_pico_previo = 0
+
+
+def _memoria_proceso(campo: str) -> Optional[int]:
+    """Campo en kB de /proc/self/status (VmRSS, VmHWM) en bytes; None fuera de Linux."""
+    try:
+        with open("/proc/self/status") as estado:
+            for linea in estado:
+                if linea.startswith(campo + ":"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_actual_bytes() -> Optional[int]:
+    return _memoria_proceso("VmRSS")
+
+
+def reiniciar_rss_pico() -> bool:
+    """Lleva el pico de RSS del proceso (VmHWM) al RSS actual escribiendo 5 en /proc/self/clear_refs.
+
+    Devuelve False si el sistema no lo permite; en ese caso no hay pico por etapa.
+    """
+    global _pico_previo
+    pico = _memoria_proceso("VmHWM")
+    try:
+        with open("/proc/self/clear_refs", "w") as archivo:
+            archivo.write("5")
+    except OSError:
+        return False
+    _pico_previo = max(_pico_previo, pico or 0)
+    return True
+
+
+def rss_pico_bytes() -> Optional[int]:
+    """RSS máximo alcanzado por el proceso desde que inició (None si la plataforma no lo expone).
+
+    Incluye los picos anteriores a cada reinicio hecho por MedidorEtapas.
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB; macOS, bytes.
+    pico = pico if sys.platform == "darwin" else pico * 1024
+    return max(pico, _pico_previo)
+
+
+class MedidorEtapas:
+    """Duración, filas y memoria de cada etapa del pipeline.
+
+    Uso: `with medidor.etapa("lectura") as etapa: ...; etapa["filas"] = len(df)`.
+    El resultado es una lista de dicts serializable, que viaja en la respuesta.
+
+    La memoria es la de la etapa y no la del proceso: RSS al empezar y al terminar, y
+    `rss_pico_bytes` como el pico alcanzado durante la etapa (se reinicia VmHWM al
+    empezarla; None donde no se puede). Los procesos de ColaTrabajos se reutilizan,
+    así que el pico histórico del proceso sería el del trabajo más grande que corrió.
+    Las etapas no deben anidarse ni medirse desde varios hilos del mismo proceso.
+    """
+
+    def __init__(self):
+        self.etapas: List[Dict] = []
+
+    @contextmanager
+    def etapa(self, nombre: str, filas: Optional[int] = None):
+        registro = {"etapa": nombre, "segundos": None, "filas": filas,
+                    "rss_inicio_bytes": rss_actual_bytes(), "rss_fin_bytes": None, "rss_pico_bytes": None}
+        con_pico = reiniciar_rss_pico()
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro["segundos"] = round(time.perf_counter() - inicio, 6)
+            registro["rss_fin_bytes"] = rss_actual_bytes()
+            if con_pico:
+                registro["rss_pico_bytes"] = _memoria_proceso("VmHWM")
+            self.etapas.append(registro)
+
+    def resultado(self) -> List[Dict]:
+        return list(self.etapas)
+
+
+def server_timing(etapas: List[Dict]) -> str:
+    """Encabezado `Server-Timing` (milisegundos) a partir del resultado de MedidorEtapas."""
+    return ", ".join(f"{e['etapa']};dur={e['segundos'] * 1000:.1f}" for e in etapas)
+
+
+@contextmanager
+def perfilar(nombre: str, activo: bool = True):
+    """Perfila el bloque con cProfile y deja el volcado en PERFILES_DIR/<nombre>.prof.
+
+    Devuelve un dict cuya clave "archivo" tiene la ruta del volcado al salir del bloque.
+    Se abre con `python -m pstats` o snakeviz.
+    """
+    salida = {"archivo": None}
+    if not activo:
+        yield salida
+        return
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield salida
+    finally:
+        perfil.disable()
+        os.makedirs(PERFILES_DIR, exist_ok=True)
+        ruta = os.path.join(PERFILES_DIR, f"{nombre}.prof")
+        perfil.dump_stats(ruta)
+        salida["archivo"] = ruta
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(etiquetas: Tuple[Tuple[str, str], ...]) -> str:
+    if not etiquetas:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in etiquetas) + "}"
+
+
+class RegistroMetricas:
+    """Histogramas y contadores en memoria expuestos en formato de texto de Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS_SEGUNDOS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._ayuda: Dict[str, Tuple[str, str]] = {}
+        # nombre -> etiquetas -> [conteos por bucket..., suma, total]
+        self._histogramas: Dict[str, Dict[Tuple, List[float]]] = {}
+        self._contadores: Dict[str, Dict[Tuple, float]] = {}
+
+    def _registrar(self, nombre: str, tipo: str, ayuda: str):
+        self._ayuda.setdefault(nombre, (tipo, ayuda))
+
+    def observar(self, nombre: str, valor: float, ayuda: str = "", **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            self._registrar(nombre, "histogram", ayuda)
+            serie = self._histogramas.setdefault(nombre, {}).setdefault(clave, [0] * (len(self.buckets) + 2))
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def incrementar(self, nombre: str, valor: float = 1, ayuda: str = "", **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            self._registrar(nombre, "counter", ayuda)
+            contador = self._contadores.setdefault(nombre, {})
+            contador[clave] = contador.get(clave, 0) + valor
+
+    def exponer(self) -> str:
+        lineas = []
+        with self._lock:
+            for nombre, series in self._histogramas.items():
+                tipo, ayuda = self._ayuda[nombre]
+                lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+                for clave, serie in series.items():
+                    for limite, conteo in zip(self.buckets, serie):
+                        lineas.append(f"{nombre}_bucket{_etiquetas(clave + (('le', limite),))} {conteo}")
+                    lineas.append(f"{nombre}_bucket{_etiquetas(clave + (('le', '+Inf'),))} {serie[-1]}")
+                    lineas.append(f"{nombre}_sum{_etiquetas(clave)} {serie[-2]}")
+                    lineas.append(f"{nombre}_count{_etiquetas(clave)} {serie[-1]}")
+            for nombre, series in self._contadores.items():
+                tipo, ayuda = self._ayuda[nombre]
+                lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+                for clave, valor in series.items():
+                    lineas.append(f"{nombre}{_etiquetas(clave)} {valor}")
+        pico = rss_pico_bytes()
+        if pico is not None:
+            lineas += [
+                "# HELP proceso_rss_pico_bytes RSS máximo del proceso del servidor.",
+                "# TYPE proceso_rss_pico_bytes gauge",
+                f"proceso_rss_pico_bytes {pico}"
+            ]
+        return "\n".join(lineas) + "\n"
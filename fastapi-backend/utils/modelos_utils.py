@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+
+
+def ruta_manifiesto(ruta_modelo: str) -> str:
+    return os.path.splitext(ruta_modelo)[0] + ".json"
+
+
+def construir_manifiesto(modelo, filas: Optional[int] = None, hash_datos: Optional[str] = None,
+                         fecha: Optional[str] = None, tamanos: Optional[List[int]] = None) -> Dict:
+    """Resumen pequeño del modelo para no tener que cargar el pickle al consultarlo.
+
+    `tamanos` (filas por cluster) pondera las métricas de estabilidad de deriva_utils.
+    """
+    columnas = getattr(modelo, "feature_names_in_", None)
+    return {
+        "tipo": type(modelo).__name__,
+        "n_clusters": int(modelo.n_clusters),
+        "inertia": float(modelo.inertia_),
+        "centros": modelo.cluster_centers_.tolist(),
+        "columnas": [str(col) for col in columnas] if columnas is not None else None,
+        "filas_entrenamiento": filas,
+        "fecha": fecha or datetime.now().isoformat(timespec="seconds"),
+        "hash_datos": hash_datos,
+        "tamanos_clusters": [int(t) for t in tamanos] if tamanos is not None else None
+    }
+
+
+def escribir_manifiesto(ruta_modelo: str, manifiesto: Dict) -> str:
+    ruta = ruta_manifiesto(ruta_modelo)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False)
+    return ruta
+
+
+class RegistroModelos:
+    """Índice en memoria de los modelos guardados y sus manifiestos.
+
+    El listado se reconstruye solo cuando cambia el mtime del directorio, y cada
+    entrada se vuelve a leer solo si cambia el mtime de su archivo .joblib. Los
+    modelos antiguos sin manifiesto se cargan una única vez para generarlo.
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self._lock = threading.Lock()
+        self._mtime_directorio = None
+        self._nombres: List[str] = []
+        self._entradas: Dict[str, tuple] = {}
+        self._centros: Dict[str, tuple] = {}
+
+    def _leer_manifiesto(self, nombre: str, mtime_modelo: int) -> Dict:
+        ruta_modelo = os.path.join(self.directorio, nombre)
+        ruta = ruta_manifiesto(ruta_modelo)
+        if os.path.exists(ruta) and os.stat(ruta).st_mtime_ns >= mtime_modelo:
+            with open(ruta, encoding="utf-8") as archivo:
+                return json.load(archivo)
+
+        modelo = joblib.load(ruta_modelo)
+        if not all(hasattr(modelo, attr) for attr in ("n_clusters", "inertia_", "cluster_centers_")):
+            raise ValueError("El archivo no es un modelo KMeans")
+        fecha = datetime.fromtimestamp(mtime_modelo / 1e9).isoformat(timespec="seconds")
+        manifiesto = construir_manifiesto(modelo, fecha=fecha)
+        escribir_manifiesto(ruta_modelo, manifiesto)
+        return manifiesto
+
+    def _refrescar(self):
+        if not os.path.isdir(self.directorio):
+            self._mtime_directorio = None
+            self._nombres, self._entradas, self._centros = [], {}, {}
+            return
+        mtime = os.stat(self.directorio).st_mtime_ns
+        if mtime == self._mtime_directorio:
+            return
+        self._nombres = sorted(
+            (archivo for archivo in os.listdir(self.directorio) if archivo.endswith(".joblib")),
+            reverse=True
+        )
+        self._entradas = {nombre: self._entradas[nombre] for nombre in self._nombres if nombre in self._entradas}
+        self._centros = {nombre: self._centros[nombre] for nombre in self._nombres if nombre in self._centros}
+        self._mtime_directorio = mtime
+
+    def obtener(self, nombre: str) -> Dict:
+        """Manifiesto de un modelo; lanza FileNotFoundError si no existe."""
+        nombre = os.path.basename(nombre)
+        ruta = os.path.join(self.directorio, nombre)
+        with self._lock:
+            try:
+                mtime = os.stat(ruta).st_mtime_ns
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Modelo no encontrado: {nombre}")
+            entrada = self._entradas.get(nombre)
+            if entrada is None or entrada[0] != mtime:
+                entrada = (mtime, self._leer_manifiesto(nombre, mtime))
+                self._entradas[nombre] = entrada
+            return entrada[1]
+
+    def centros(self, nombre: str) -> np.ndarray:
+        """Centros del manifiesto como arreglo de solo lectura, convertido una vez por versión del modelo."""
+        nombre = os.path.basename(nombre)
+        manifiesto = self.obtener(nombre)
+        with self._lock:
+            entrada = self._centros.get(nombre)
+            if entrada is None or entrada[0] is not manifiesto:
+                centros = np.asarray(manifiesto["centros"], dtype=np.float64)
+                centros.flags.writeable = False
+                entrada = (manifiesto, centros)
+                self._centros[nombre] = entrada
+            return entrada[1]
+
+    def listar(self, n_clusters: Optional[int] = None, buscar: Optional[str] = None) -> List[str]:
+        with self._lock:
+            self._refrescar()
+            nombres = list(self._nombres)
+        if buscar:
+            nombres = [nombre for nombre in nombres if buscar.lower() in nombre.lower()]
+        if n_clusters is not None:
+            nombres = [nombre for nombre in nombres if self._n_clusters(nombre) == n_clusters]
+        return nombres
+
+    def _n_clusters(self, nombre: str) -> Optional[int]:
+        try:
+            return self.obtener(nombre)["n_clusters"]
+        except (FileNotFoundError, ValueError):
+            return None
@@ -0,0 +1,253 @@
+import os
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pyarrow import ArrowException
+
+from mapeos.cuestionario import CUESTIONARIO
+from utils.codificacion_utils import CodificadorEncuesta, limpiar_valores
+from utils.conjunto_utils import ConjuntoEncuesta
+from utils.entrenamiento_utils import ConfiguracionKMeans
+from utils.exportacion_utils import exportar_columnar
+from utils.ingesta_utils import ingerir_por_lotes
+from utils.kmeans_utils import aplicar_kmeans
+from utils.metricas_utils import MedidorEtapas
+from utils.puntuacion_utils import MotorPuntuacion, etiqueta_por_rango
+from utils.seleccion_k_utils import MUESTRA_SILUETA, evaluar_k
+
+UPLOAD_DIR = "cleaned_data"
+FILAS_PREVIEW = 100
+MODOS_INGESTA = ("completo", "por_lotes")
+ETAPAS = ("ingesta", "codificacion", "entrenamiento", "exportacion")
+
+codificador = CodificadorEncuesta(CUESTIONARIO)
+motor_puntuacion = MotorPuntuacion(CUESTIONARIO)
+
+
+class ErrorValidacion(ValueError):
+    """Error de datos de entrada; el endpoint lo devuelve como 400 con `detalle`."""
+
+    def __init__(self, detalle):
+        super().__init__(detalle)
+        self.detalle = detalle
+
+
+def _sin_reporte(etapa: str):
+    pass
+
+
+def validar_preguntas_por_categoria(df_columnas):
+    errores = []
+    for categoria, preguntas in CUESTIONARIO.categorias.items():
+        seleccionadas = [p for p in preguntas if p in df_columnas]
+        minimo = CUESTIONARIO.minimos_por_categoria[categoria]
+        if len(seleccionadas) < minimo:
+            errores.append(f"{categoria}: mínimo requerido es {minimo}, seleccionadas: {len(seleccionadas)}")
+    return errores
+
+
+def validar_encabezado(encabezado) -> None:
+    """Rechaza un archivo sin ninguna pregunta del cuestionario antes de leerlo completo."""
+    if not codificador.columnas_codificadas(codificador.nombres_normalizados(encabezado)):
+        raise ErrorValidacion("El archivo no contiene preguntas del cuestionario.")
+
+
+def preparar_set_numerico(file_path: str, modo_ingesta: str, variables_usar: Optional[list],
+                          reportar: Callable[[str], None] = _sin_reporte,
+                          medidor: Optional[MedidorEtapas] = None):
+    """Lee, limpia, codifica y puntúa el archivo; deja el set listo para KMeans.
+
+    Devuelve el set limpio de texto, el ConjuntoEncuesta con puntajes y clasificación
+    (solo filas con todas las respuestas seleccionadas válidas), el total de filas
+    antes de descartarlas y el nombre del Parquet con el set limpio (None si no se generó).
+    """
+    medidor = medidor or MedidorEtapas()
+    nombre_sin_ext = os.path.splitext(os.path.basename(file_path))[0]
+
+    reportar("ingesta")
+    if modo_ingesta == "por_lotes":
+        # Solo se conserva la matriz codificada; no hay set limpio de texto que exportar.
+        df = pd.DataFrame()
+        archivo_limpio = None
+        with medidor.etapa("lectura_codificacion") as etapa:
+            conjunto = ingerir_por_lotes(file_path, codificador).como_conjunto()
+            etapa["filas"] = len(conjunto)
+        reportar("codificacion")
+    else:
+        with medidor.etapa("lectura") as etapa:
+            df = pd.read_csv(file_path) if file_path.endswith('.csv') else pd.read_excel(file_path)
+            etapa["filas"] = len(df)
+
+        with medidor.etapa("limpieza") as etapa:
+            df.columns = df.columns.str.strip()
+            df = df.dropna()
+            df = limpiar_valores(df)
+            etapa["filas"] = len(df)
+
+        # El Excel limpio se genera solo si se descarga (ver exportacion_utils.materializar).
+        with medidor.etapa("exportacion_limpio", filas=len(df)):
+            try:
+                exportar_columnar(df, os.path.join(UPLOAD_DIR, f"limpio_{nombre_sin_ext}.parquet"))
+                archivo_limpio = f"limpio_{nombre_sin_ext}.parquet"
+            except (ArrowException, ValueError, TypeError):
+                # Columnas con tipos mezclados que Parquet no admite: se conserva el Excel directo.
+                df.to_excel(os.path.join(UPLOAD_DIR, f"limpio_{nombre_sin_ext}.xlsx"), index=False, engine="openpyxl")
+                archivo_limpio = None
+
+        reportar("codificacion")
+        with medidor.etapa("codificacion", filas=len(df)):
+            conjunto = codificador.codificar_conjunto(df)
+
+    columnas_existentes = conjunto.columnas
+
+    if variables_usar:
+        columnas_existentes = [col for col in variables_usar if col in conjunto.columnas]
+        if not columnas_existentes:
+            raise ErrorValidacion("No hay columnas válidas seleccionadas.")
+
+        errores_validacion = validar_preguntas_por_categoria(columnas_existentes)
+        if errores_validacion:
+            raise ErrorValidacion({
+                "error": "No se cumplen los mínimos por categoría.",
+                "detalles": errores_validacion
+            })
+
+    total_original = len(conjunto)
+    with medidor.etapa("puntuacion", filas=total_original) as etapa:
+        # ✅ Puntajes por categoría (alimentan la gráfica radar), puntaje total y personalidad
+        conjunto = motor_puntuacion.puntuar(conjunto, columnas_existentes)
+        etapa["filas"] = len(conjunto)
+
+    return df, conjunto, total_original, archivo_limpio
+
+
+def evaluar_k_archivo(file_path: str, modo_ingesta: str = "completo", variables_usar: Optional[list] = None,
+                      k_min: int = 1, k_max: int = 10, muestra_silueta: int = MUESTRA_SILUETA,
+                      reportar: Callable[[str], None] = _sin_reporte) -> dict:
+    """Trabajo de /evaluar-k: prepara el set como /generar-set-numerico y evalúa el rango de k."""
+    _, conjunto, _, _ = preparar_set_numerico(file_path, modo_ingesta, variables_usar, reportar)
+    reportar("entrenamiento")
+    return evaluar_k(conjunto.caracteristicas(), k_min, k_max, muestra_silueta)
+
+
+def predecir_personalidad(conjunto: ConjuntoEncuesta) -> np.ndarray:
+    """Código de etiqueta de cada fila según el rango del puntaje total promedio de su cluster."""
+    conteos = np.bincount(conjunto.clusters)
+    sumas = np.bincount(conjunto.clusters, weights=conjunto.puntajes[:, -1])
+    presentes = np.flatnonzero(conteos)
+    orden = presentes[np.argsort(sumas[presentes] / conteos[presentes])]
+
+    codigos = np.zeros(len(conteos), dtype=np.int8)
+    for rango, cluster in enumerate(orden):
+        codigos[cluster] = conjunto.etiquetas.index(etiqueta_por_rango(rango, len(orden)))
+    return codigos[conjunto.clusters]
+
+
+def resumir_resultado(df_resultado: pd.DataFrame) -> dict:
+    """Conteo y promedios por categoría de cada Personalidad sobre todas las filas (para las gráficas)."""
+    categorias = [cat for cat in CUESTIONARIO.categorias if cat in df_resultado.columns]
+    grupos = df_resultado.groupby("Personalidad", observed=True)
+    return {
+        "conteo": {str(k): int(v) for k, v in grupos.size().items()},
+        "promedios": {
+            str(personalidad): {cat: float(valor) for cat, valor in fila.items()}
+            for personalidad, fila in grupos[categorias].mean().iterrows()
+        }
+    }
+
+
+def procesar_set_numerico(file_path: str, nombre_sin_ext: str, variables_usar: Optional[list] = None,
+                          modo_ingesta: str = "completo", modo_entrenamiento: str = "completo",
+                          modelo_base: Optional[str] = None, n_clusters: int = 3,
+                          seleccionar_k: bool = False, filas_preview: int = FILAS_PREVIEW,
+                          configuracion: Optional[ConfiguracionKMeans] = None,
+                          umbral_deriva: Optional[float] = None, modelo_referencia: Optional[str] = None,
+                          reportar: Callable[[str], None] = _sin_reporte) -> dict:
+    """Pipeline completo de /generar-set-numerico: prepara, entrena y exporta los artefactos.
+
+    `reportar` se llama al inicio de cada etapa (ver ETAPAS); los trabajos en segundo
+    plano lo usan para publicar el progreso y para atender cancelaciones. La respuesta
+    incluye solo `filas_preview` filas; el resto se pagina con /filas/{archivo}.
+
+    La duración, filas y memoria de cada etapa vuelven en `metricas_etapas`, y la
+    comparación con el modelo de referencia en `deriva` (ver kmeans_utils.aplicar_kmeans).
+    """
+    medidor = MedidorEtapas()
+    df, conjunto, total_original, archivo_limpio = preparar_set_numerico(
+        file_path, modo_ingesta, variables_usar, reportar, medidor
+    )
+    total_final = len(conjunto)
+    eliminados = total_original - total_final
+
+    reportar("entrenamiento")
+    evaluacion_k = None
+    if seleccionar_k:
+        with medidor.etapa("seleccion_k", filas=total_final):
+            evaluacion_k = evaluar_k(conjunto.caracteristicas(), 2, 10)
+            n_clusters = evaluacion_k["k_sugerido"] or n_clusters
+
+    conjunto, ruta_modelo, deriva = aplicar_kmeans(
+        conjunto,
+        n_clusters=n_clusters,
+        modo=modo_entrenamiento,
+        modelo_base=modelo_base,
+        medidor=medidor,
+        configuracion=configuracion,
+        umbral_deriva=umbral_deriva,
+        modelo_referencia=modelo_referencia
+    )
+
+    conjunto.prediccion = predecir_personalidad(conjunto)
+
+    reportar("exportacion")
+    with medidor.etapa("exportacion", filas=total_final):
+        df_resultado = conjunto.como_dataframe()
+        # Un único artefacto canónico; CSV y XLSX se derivan al descargarlos.
+        exportar_columnar(df_resultado, os.path.join(UPLOAD_DIR, f"resultado_{nombre_sin_ext}.parquet"))
+
+    with medidor.etapa("respuesta", filas=min(filas_preview, len(df_resultado))):
+        preview_limpio = df.head(filas_preview).replace({pd.NA: None, np.nan: None}).to_dict(orient="records")
+        preview_numerico = df_resultado.head(filas_preview).replace({pd.NA: None, np.nan: None}).to_dict(orient="records")
+        resumen = resumir_resultado(df_resultado)
+
+    return {
+        "message": "Archivo procesado correctamente",
+        "rows": total_final,
+        "eliminados_por_nan": eliminados,
+        "preview_limpio": preview_limpio,
+        "preview_numerico": preview_numerico,
+        "total_limpio": len(df),
+        "resumen": resumen,
+        "columns_limpio": list(df.columns),
+        "columns_numerico": list(df_resultado.columns),
+        "archivo_cluster": f"clusterizado_{nombre_sin_ext}.csv",
+        "archivo_numerico": f"numerico_{nombre_sin_ext}.xlsx",
+        "archivo_prediccion": f"prediccion_{nombre_sin_ext}.xlsx",
+        "archivo_resultado": f"resultado_{nombre_sin_ext}.parquet",
+        "archivo_limpio": archivo_limpio,
+        # Excel del set limpio para /descargar-archivo (derivado del Parquet o escrito directo).
+        "archivo_limpio_descarga": (
+            None if modo_ingesta == "por_lotes"
+            else f"limpio_{os.path.splitext(os.path.basename(file_path))[0]}.xlsx"
+        ),
+        "modelo_guardado": ruta_modelo,
+        "n_clusters": n_clusters,
+        "evaluacion_k": evaluacion_k,
+        "deriva": deriva,
+        "metricas_etapas": medidor.resultado()
+    }
+
+
+def artefactos_de(respuesta: dict) -> list:
+    """Rutas en disco de los archivos generados por procesar_set_numerico.
+
+    Incluye el set limpio: si la retención lo borra, la entrada de caché deja de ser válida
+    en lugar de devolver un `archivo_limpio` que /filas ya no encuentra. Sin Parquet
+    (tipos mezclados) el set limpio es directamente el Excel de `archivo_limpio_descarga`.
+    """
+    artefactos = [os.path.join(UPLOAD_DIR, respuesta["archivo_resultado"]), respuesta["modelo_guardado"]]
+    limpio = respuesta.get("archivo_limpio") or respuesta.get("archivo_limpio_descarga")
+    if limpio is not None:
+        artefactos.append(os.path.join(UPLOAD_DIR, limpio))
+    return artefactos
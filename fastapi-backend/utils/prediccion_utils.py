@@ -0,0 +1,142 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import joblib
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from mapeos.cuestionario import CUESTIONARIO
+from utils.codificacion_utils import limpiar_texto
+from utils.kmeans_utils import MODELOS_DIR
+from utils.puntuacion_utils import etiquetas_por_cluster
+
+MODELOS_EN_CACHE = 32
+
+
+@dataclass(frozen=True)
+class ModeloCargado:
+    """Modelo KMeans listo para predecir sin volver a leer el archivo."""
+
+    nombre: str
+    centros: np.ndarray
+    columnas: Tuple[str, ...]
+    columnas_p: Tuple[str, ...]
+    indices_p: Tuple[int, ...]
+    categorias: Tuple[Tuple[int, Tuple[int, ...]], ...]
+    etiquetas: Dict[int, str]
+
+
+def _clave_columna(columna: str) -> str:
+    """Clave pN o categoría de una columna del modelo.
+
+    Los modelos más antiguos se entrenaron con el texto normalizado de la pregunta como
+    nombre de columna; se traducen con `mapa_columnas`. Cualquier otra columna es un error:
+    sin ella el vector de entrada quedaría en ceros y todas las predicciones serían iguales.
+    """
+    if columna in CUESTIONARIO.opciones_normalizadas or columna in CUESTIONARIO.categorias:
+        return columna
+    clave = CUESTIONARIO.mapa_columnas.get(limpiar_texto(columna))
+    if clave is None:
+        raise ValueError(f"El modelo usa una columna que no es del cuestionario: {columna}")
+    return clave
+
+
+@lru_cache(maxsize=MODELOS_EN_CACHE)
+def _cargar(ruta: str, mtime_ns: int) -> ModeloCargado:
+    modelo = joblib.load(ruta)
+    if not isinstance(modelo, (KMeans, MiniBatchKMeans)):
+        raise ValueError("El archivo no es un modelo KMeans")
+    if not hasattr(modelo, "feature_names_in_"):
+        raise ValueError("El modelo no registra las columnas con las que fue entrenado")
+
+    columnas = tuple(_clave_columna(col) for col in modelo.feature_names_in_)
+    columnas_p = tuple(col for col in columnas if col in CUESTIONARIO.opciones_normalizadas)
+    if not columnas_p:
+        raise ValueError("El modelo no usa ninguna pregunta del cuestionario")
+    indices_p = tuple(columnas.index(col) for col in columnas_p)
+    categorias = tuple(
+        (columnas.index(col), tuple(columnas.index(p) for p in CUESTIONARIO.categorias[col] if p in columnas_p))
+        for col in columnas if col in CUESTIONARIO.categorias
+    )
+    centros = np.asarray(modelo.cluster_centers_, dtype=np.float64)
+    return ModeloCargado(
+        nombre=os.path.basename(ruta),
+        centros=centros,
+        columnas=columnas,
+        columnas_p=columnas_p,
+        indices_p=indices_p,
+        categorias=categorias,
+        etiquetas=etiquetas_por_cluster(centros, indices_p)
+    )
+
+
+def obtener_modelo(nombre_modelo: str) -> ModeloCargado:
+    """Devuelve el modelo desde la caché LRU; la clave incluye el mtime para detectar cambios."""
+    ruta = os.path.join(MODELOS_DIR, os.path.basename(nombre_modelo))
+    try:
+        mtime_ns = os.stat(ruta).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Modelo no encontrado: {nombre_modelo}")
+    return _cargar(ruta, mtime_ns)
+
+
+def codificar_respuesta(clave: str, valor):
+    """Acepta el puntaje numérico o el texto de la opción; devuelve None si no es válido."""
+    opciones = CUESTIONARIO.opciones_normalizadas[clave]
+    if valor is None or isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        return valor if valor in opciones.values() else None
+    return opciones.get(limpiar_texto(valor))
+
+
+def completar_categorias(modelo: ModeloCargado, X: np.ndarray) -> np.ndarray:
+    """Llena las columnas de categoría de `X` con la suma de sus preguntas (como en el entrenamiento)."""
+    for indice, indices_categoria in modelo.categorias:
+        X[:, indice] = X[:, list(indices_categoria)].sum(axis=1)
+    return X
+
+
+def asignar_clusters(modelo: ModeloCargado, X: np.ndarray) -> np.ndarray:
+    """Índice del centro más cercano a cada fila (distancia euclidiana al cuadrado).
+
+    Se recorre un centro a la vez: la memoria es la de `X` y no filas x clusters x columnas.
+    """
+    mejores = np.full(len(X), np.inf)
+    clusters = np.zeros(len(X), dtype=np.intp)
+    for cluster, centro in enumerate(modelo.centros):
+        distancia = ((X - centro) ** 2).sum(axis=1)
+        mas_cerca = distancia < mejores
+        mejores[mas_cerca] = distancia[mas_cerca]
+        clusters[mas_cerca] = cluster
+    return clusters
+
+
+def predecir_respuestas(modelo: ModeloCargado, respuestas: List[Dict]) -> List[Dict]:
+    """Asigna el centro más cercano a cada encuestado usando solo operaciones de numpy."""
+    X = np.zeros((len(respuestas), len(modelo.columnas)), dtype=np.float64)
+    errores = []
+    for i, respuesta in enumerate(respuestas):
+        for clave, indice in zip(modelo.columnas_p, modelo.indices_p):
+            valor = codificar_respuesta(clave, respuesta.get(clave))
+            if valor is None:
+                errores.append(f"Encuestado {i}: respuesta faltante o no válida para {clave}")
+            else:
+                X[i, indice] = valor
+    if errores:
+        raise ValueError(errores)
+
+    completar_categorias(modelo, X)
+    clusters = asignar_clusters(modelo, X)
+    totales = X[:, list(modelo.indices_p)].sum(axis=1)
+
+    return [
+        {
+            "Cluster": int(cluster),
+            "Prediccion_Personalidad": modelo.etiquetas.get(int(cluster)),
+            "Puntaje Total": int(total)
+        }
+        for cluster, total in zip(clusters, totales)
+    ]
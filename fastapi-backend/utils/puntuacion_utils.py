@@ -0,0 +1,75 @@
+from dataclasses import replace
+from typing import Dict
+
+import numpy as np
+
+from mapeos.cuestionario import CUESTIONARIO
+from utils.conjunto_utils import ConjuntoEncuesta
+
+ETIQUETAS_PERSONALIDAD = CUESTIONARIO.etiquetas_personalidad
+
+
+class MotorPuntuacion:
+    """Puntajes por categoría, puntaje total y clasificación a partir de la matriz int8 del conjunto.
+
+    Todas las sumas salen de un único producto matricial contra la matriz de
+    pertenencia del cuestionario (más una columna de unos para el total), y la
+    clasificación es un `np.digitize` sobre los umbrales del cuestionario.
+    """
+
+    def __init__(self, cuestionario):
+        self.cuestionario = cuestionario
+        self._posiciones = {clave: i for i, clave in enumerate(cuestionario.claves)}
+        self._nombres_categoria = tuple(cuestionario.categorias)
+
+    def puntuar(self, conjunto: ConjuntoEncuesta, columnas: list) -> ConjuntoEncuesta:
+        """Puntajes int16 por categoría (solo las que tienen alguna pregunta en `columnas`),
+        "Puntaje Total" y códigos de personalidad, sobre las filas con todas las respuestas válidas.
+
+        El producto se hace sobre la matriz int8 del conjunto; las respuestas
+        faltantes valen 0 y esas filas se descartan aquí mismo.
+        """
+        conjunto = conjunto.seleccionar(columnas)
+        conjunto = conjunto.filtrar(~conjunto.faltantes.any(axis=1))
+
+        pertenencia = self.cuestionario.matriz_categorias[[self._posiciones[c] for c in columnas]]
+        presentes = np.flatnonzero(pertenencia.any(axis=0))
+
+        matriz = np.empty((len(columnas), len(presentes) + 1), dtype=np.int16)
+        matriz[:, :-1] = pertenencia[:, presentes]
+        matriz[:, -1] = 1
+        puntajes = np.matmul(conjunto.respuestas, matriz, dtype=np.int16)
+
+        return replace(
+            conjunto,
+            columnas_puntaje=[self._nombres_categoria[j] for j in presentes] + ["Puntaje Total"],
+            puntajes=puntajes,
+            etiquetas=tuple(self.cuestionario.etiquetas_personalidad),
+            personalidad=self.codigos_personalidad(puntajes[:, -1])
+        )
+
+    def codigos_personalidad(self, totales) -> np.ndarray:
+        """Índice en `etiquetas_personalidad` por rangos de puntaje total (límite superior inclusivo)."""
+        return np.digitize(np.asarray(totales), self.cuestionario.umbrales_personalidad, right=True).astype(np.int8)
+
+
+def etiqueta_por_rango(rango: int, n_clusters: int) -> str:
+    """Etiqueta del cluster según su posición al ordenar por puntaje total.
+
+    Con 3 clusters es el mapeo directo; con otro k los rangos se reparten de forma
+    proporcional entre Introvertido, Ambivertido y Extrovertido.
+    """
+    if n_clusters <= 1:
+        return ETIQUETAS_PERSONALIDAD[1]
+    posicion = int(rango * (len(ETIQUETAS_PERSONALIDAD) - 1) / (n_clusters - 1) + 0.5)
+    return ETIQUETAS_PERSONALIDAD[posicion]
+
+
+def etiquetas_por_cluster(centros: np.ndarray, indices_p) -> Dict[int, str]:
+    """Ordena los clusters por el puntaje total de su centro, como en /generar-set-numerico.
+
+    El centro es el promedio de sus filas, así que la suma de sus coordenadas en las
+    preguntas es el "Puntaje Total" promedio del cluster.
+    """
+    orden = np.argsort(centros[:, list(indices_p)].sum(axis=1), kind="stable")
+    return {int(cluster): etiqueta_por_rango(rango, len(centros)) for rango, cluster in enumerate(orden)}
@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+from threadpoolctl import threadpool_limits
+
+from utils.kmeans_utils import hash_datos
+
+MUESTRA_SILUETA = 5_000
+EVALUACIONES_EN_CACHE = 64
+
+_cache_evaluaciones: "OrderedDict[tuple, Dict]" = OrderedDict()
+_lock_cache = threading.Lock()
+
+# Datos compartidos por cada proceso del pool (se envían una vez por proceso, no por k).
+_X_proceso: Optional[np.ndarray] = None
+
+# Procesos por evaluación cuando no se indican; ColaTrabajos lo fija en sus trabajadores
+# para que entre todos los trabajos no pasen de un proceso por núcleo.
+procesos_por_defecto: Optional[int] = None
+
+
+def _iniciar_proceso(X: np.ndarray):
+    global _X_proceso
+    _X_proceso = X
+
+
+def _evaluar_un_k(k: int, muestra_silueta: int) -> Dict:
+    X = _X_proceso
+    # Un hilo por proceso: el paralelismo viene del pool, no de OpenMP.
+    with threadpool_limits(1):
+        modelo = KMeans(n_clusters=k, random_state=42)
+        etiquetas = modelo.fit_predict(X)
+
+        silueta = davies_bouldin = None
+        if 1 < k < len(X):
+            tamano = min(muestra_silueta, len(X))
+            silueta = float(silhouette_score(X, etiquetas, sample_size=tamano, random_state=42))
+            davies_bouldin = float(davies_bouldin_score(X, etiquetas))
+
+    return {
+        "k": k,
+        "inertia": float(modelo.inertia_),
+        "silueta": silueta,
+        "davies_bouldin": davies_bouldin
+    }
+
+
+def sugerir_k(resultados: List[Dict]) -> Optional[int]:
+    """k con la mayor silueta; None si ningún k del rango permite calcularla."""
+    candidatos = [r for r in resultados if r["silueta"] is not None]
+    if not candidatos:
+        return None
+    return max(candidatos, key=lambda r: r["silueta"])["k"]
+
+
+def evaluar_k(X: pd.DataFrame, k_min: int = 1, k_max: int = 10,
+              muestra_silueta: int = MUESTRA_SILUETA, n_procesos: Optional[int] = None) -> Dict:
+    """Evalúa KMeans para cada k del rango en paralelo (método del codo, silueta y Davies–Bouldin).
+
+    Los resultados se guardan en caché por huella de los datos, columnas y parámetros.
+    """
+    if k_min < 1 or k_max < k_min:
+        raise ValueError("El rango de k no es válido.")
+    k_max = min(k_max, len(X))
+    if k_max < k_min:
+        raise ValueError("No hay suficientes filas para el rango de k solicitado.")
+
+    clave = (hash_datos(X), tuple(X.columns), k_min, k_max, muestra_silueta)
+    with _lock_cache:
+        if clave in _cache_evaluaciones:
+            _cache_evaluaciones.move_to_end(clave)
+            return _cache_evaluaciones[clave]
+
+    ks = list(range(k_min, k_max + 1))
+    datos = X.to_numpy(dtype=np.float64)
+    n_procesos = min(len(ks), n_procesos or procesos_por_defecto or os.cpu_count() or 1)
+    if n_procesos == 1:
+        _iniciar_proceso(datos)
+        try:
+            resultados = [_evaluar_un_k(k, muestra_silueta) for k in ks]
+        finally:
+            _iniciar_proceso(None)
+    else:
+        # spawn: el proceso que llama puede tener hilos (OpenMP, el servidor) y fork no es seguro.
+        with ProcessPoolExecutor(max_workers=n_procesos, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_iniciar_proceso, initargs=(datos,)) as pool:
+            resultados = list(pool.map(_evaluar_un_k, ks, [muestra_silueta] * len(ks)))
+
+    evaluacion = {
+        "columnas": list(X.columns),
+        "filas": len(X),
+        "resultados": resultados,
+        "k_sugerido": sugerir_k(resultados)
+    }
+    with _lock_cache:
+        _cache_evaluaciones[clave] = evaluacion
+        while len(_cache_evaluaciones) > EVALUACIONES_EN_CACHE:
+            _cache_evaluaciones.popitem(last=False)
+    return evaluacion
@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+from utils import entrenamiento_utils, seleccion_k_utils
+from utils.metricas_utils import perfilar
+from utils.pipeline_utils import ETAPAS
+
+MAX_TRABAJOS_CONCURRENTES = int(os.environ.get("KMEANS_MAX_TRABAJOS", "2"))
+TRABAJOS_EN_HISTORIAL = 200
+
+
+class TrabajoCancelado(Exception):
+    pass
+
+
+def _iniciar_trabajador(procesos_por_trabajo: int):
+    seleccion_k_utils.procesos_por_defecto = procesos_por_trabajo
+    entrenamiento_utils.procesos_por_defecto = procesos_por_trabajo
+
+
+def _ejecutar(id_trabajo: str, progreso, cancelados, funcion: Callable, parametros: Dict,
+              con_perfil: bool = False):
+    """Se ejecuta en el proceso trabajador: publica cada etapa y atiende la cancelación.
+
+    Con `con_perfil` el trabajo se perfila con cProfile dentro del trabajador (donde
+    ocurre el cómputo) y la ruta del volcado se agrega al resultado como `archivo_perfil`.
+    """
+
+    def reportar(etapa: str):
+        if id_trabajo in cancelados:
+            raise TrabajoCancelado()
+        progreso[id_trabajo] = {
+            "etapa": etapa,
+            "progreso": ETAPAS.index(etapa) / len(ETAPAS) if etapa in ETAPAS else None
+        }
+
+    with perfilar(id_trabajo, activo=con_perfil) as perfil:
+        resultado = funcion(reportar=reportar, **parametros)
+    if con_perfil and isinstance(resultado, dict):
+        resultado["archivo_perfil"] = perfil["archivo"]
+    return resultado
+
+
+class ColaTrabajos:
+    """Cola de trabajos de entrenamiento sobre un pool de procesos.
+
+    El progreso y las solicitudes de cancelación se comparten con los procesos
+    trabajadores mediante diccionarios de un `multiprocessing.Manager`. Un trabajo
+    en cola se cancela de inmediato; uno en ejecución se detiene al comenzar su
+    siguiente etapa. Cada trabajador usa a lo sumo `núcleos / max_trabajos` procesos
+    al evaluar k y en los reinicios de KMeans, así el total queda acotado por núcleo.
+    """
+
+    def __init__(self, max_trabajos: int = MAX_TRABAJOS_CONCURRENTES):
+        self.max_trabajos = max_trabajos
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._progreso = None
+        self._cancelados = None
+        self._trabajos: Dict[str, Dict] = {}
+
+    def _iniciar(self):
+        if self._pool is None:
+            contexto = multiprocessing.get_context("spawn")
+            self._manager = contexto.Manager()
+            self._progreso = self._manager.dict()
+            self._cancelados = self._manager.dict()
+            procesos_por_trabajo = max(1, (os.cpu_count() or 1) // self.max_trabajos)
+            self._pool = ProcessPoolExecutor(max_workers=self.max_trabajos, mp_context=contexto,
+                                             initializer=_iniciar_trabajador, initargs=(procesos_por_trabajo,))
+
+    def enviar(self, funcion: Callable, parametros: Dict,
+               al_terminar: Optional[Callable[[Dict], None]] = None, con_perfil: bool = False) -> str:
+        """Encola `funcion(**parametros)`; `al_terminar` recibe el resultado en este proceso."""
+        with self._lock:
+            self._iniciar()
+            id_trabajo = uuid.uuid4().hex
+            futuro = self._pool.submit(
+                _ejecutar, id_trabajo, self._progreso, self._cancelados, funcion, parametros, con_perfil
+            )
+            self._trabajos[id_trabajo] = {"futuro": futuro, "creado": time.time(), "terminado": None}
+            self._podar()
+
+        def _terminado(f: Future):
+            self._trabajos[id_trabajo]["terminado"] = time.time()
+            if al_terminar is not None and not f.cancelled() and f.exception() is None:
+                al_terminar(f.result())
+
+        futuro.add_done_callback(_terminado)
+        return id_trabajo
+
+    def futuro(self, id_trabajo: str) -> Future:
+        trabajo = self._trabajos.get(id_trabajo)
+        if trabajo is None:
+            raise KeyError(id_trabajo)
+        return trabajo["futuro"]
+
+    def estado(self, id_trabajo: str) -> Dict:
+        futuro = self.futuro(id_trabajo)
+        trabajo = self._trabajos[id_trabajo]
+        progreso = self._progreso.get(id_trabajo, {"etapa": None, "progreso": 0.0})
+        respuesta = {"id": id_trabajo, "creado": trabajo["creado"], "terminado": trabajo["terminado"], **progreso}
+
+        if futuro.cancelled():
+            return {**respuesta, "estado": "cancelado"}
+        if not futuro.done():
+            return {**respuesta, "estado": "en_ejecucion" if futuro.running() and progreso["etapa"] else "en_cola"}
+
+        error = futuro.exception()
+        if isinstance(error, TrabajoCancelado):
+            return {**respuesta, "estado": "cancelado"}
+        if error is not None:
+            return {**respuesta, "estado": "error", "error": getattr(error, "detalle", str(error))}
+        return {**respuesta, "estado": "completado", "progreso": 1.0, "resultado": futuro.result()}
+
+    def cancelar(self, id_trabajo: str) -> bool:
+        """Cancela el trabajo; devuelve False si ya había terminado."""
+        futuro = self.futuro(id_trabajo)
+        if futuro.done():
+            return False
+        if not futuro.cancel():
+            self._cancelados[id_trabajo] = True
+        return True
+
+    def _podar(self):
+        terminados = sorted(
+            (t["terminado"], id_trabajo) for id_trabajo, t in self._trabajos.items() if t["terminado"]
+        )
+        for _, id_trabajo in terminados[:max(0, len(self._trabajos) - TRABAJOS_EN_HISTORIAL)]:
+            del self._trabajos[id_trabajo]
+            self._progreso.pop(id_trabajo, None)
+            self._cancelados.pop(id_trabajo, None)
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._manager.shutdown()
+            self._pool = None
+
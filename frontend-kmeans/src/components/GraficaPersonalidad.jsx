@@ -20,10 +20,11 @@ import {
 
 const COLORS = ["#0088FE", "#00C49F", "#FF8042"];
 
-function GraficaPersonalidad({ datos }) {
+function GraficaPersonalidad({ datos, resumen }) {
   // ==================== GRÁFICA 1 y 2 ====================
-  // Contar cantidad por tipo de personalidad
-  const conteo = datos.reduce((acc, fila) => {
+  // Contar cantidad por tipo de personalidad (el backend envía el conteo de
+  // todas las filas en `resumen`; `datos` es solo la vista previa)
+  const conteo = resumen ? resumen.conteo : datos.reduce((acc, fila) => {
     const tipo = fila["Personalidad"];
     acc[tipo] = (acc[tipo] || 0) + 1;
     return acc;
@@ -45,7 +46,7 @@ function GraficaPersonalidad({ datos }) {
 
   const promediosPorGrupo = {};
 
-  datos.forEach((fila) => {
+  (resumen ? [] : datos).forEach((fila) => {
     const grupo = fila["Personalidad"];
     if (!promediosPorGrupo[grupo]) {
       promediosPorGrupo[grupo] = { count: 0 };
@@ -59,10 +60,16 @@ function GraficaPersonalidad({ datos }) {
     promediosPorGrupo[grupo].count += 1;
   });
 
+  if (resumen) {
+    Object.entries(resumen.promedios).forEach(([grupo, promedios]) => {
+      promediosPorGrupo[grupo] = { ...promedios, count: 1 };
+    });
+  }
+
   const radarData = categorias.map((cat) => {
     const resultado = { categoria: cat };
     Object.entries(promediosPorGrupo).forEach(([grupo, valores]) => {
-      resultado[grupo] = (valores[cat] / valores.count).toFixed(2);
+      resultado[grupo] = ((valores[cat] || 0) / valores.count).toFixed(2);
     });
     return resultado;
   });
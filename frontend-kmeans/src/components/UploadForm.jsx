@@ -23,6 +23,7 @@ function UploadForm({ setResultados }) {
   const [error, setError] = useState(null);
   const [vistaLimpia, setVistaLimpia] = useState(null);
   const [vistaNumerica, setVistaNumerica] = useState(null);
+  const [resumen, setResumen] = useState(null);
   const [nombreLimpio, setNombreLimpio] = useState(null);
   const [nombreNumerico, setNombreNumerico] = useState(null);
   const [nombreCluster, setNombreCluster] = useState(null);
@@ -62,8 +63,9 @@ function UploadForm({ setResultados }) {
         setResultados(data);
         setVistaLimpia(data.preview_limpio);
         setVistaNumerica(data.preview_numerico);
-        setNombreLimpio(`limpio_${file.name}`);
-        setNombreNumerico(`numerico_${file.name}`);
+        setResumen(data.resumen || null);
+        setNombreLimpio(data.archivo_limpio_descarga);
+        setNombreNumerico(data.archivo_numerico);
         setNombreCluster(data.archivo_cluster);
         setTabIndex(0);
       } else {
@@ -227,7 +229,7 @@ function UploadForm({ setResultados }) {
               <Typography variant="subtitle1" sx={{ fontWeight: "bold", mb: 2 }}>
                 📊 Gráfico de clasificación de personalidad
               </Typography>
-              <GraficaPersonalidad datos={vistaNumerica} />
+              <GraficaPersonalidad datos={vistaNumerica} resumen={resumen} />
             </Box>
           )}
 